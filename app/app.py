@@ -1,78 +1,300 @@
 # Basically the requests package is the one that is able to pull in json data
+import hashlib
+import heapq
+import importlib
+import json
 import os
 import re
-from collections import Counter
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import spacy
-from nltk.stem.porter import *
-import gensim
-from serpapi import GoogleSearch
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from importlib.metadata import PackageNotFoundError, version
+from io import BytesIO
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from app import scheduler
+from app.gazetteer import SkillGazetteer
+from app.lemma_cache import description_key
+from app.metrics import SERPAPI_CALLS, SERPAPI_ERRORS, time_stage
+
+# Seconds spent importing and loading each heavy dependency, reported by the readiness endpoint
+startup_timings = {}
+
+
+def timed_import(name):
+    started = time.perf_counter()
+    module = importlib.import_module(name)
+    startup_timings.setdefault(f"import {name}", time.perf_counter() - started)
+    return module
+
+
+pd = timed_import('pandas')
 
 # 4. Aggregation
 
 # Spacy lemmatizer | basically this cuts the words
-# Load core model
-sp = spacy.load('en_core_web_sm')
-# Remove stopwords
-all_stopwords = sp.Defaults.stop_words
+# The model is loaded on first use or by the startup warm-up, not at import
+NLP_MODEL = 'en_core_web_sm'
+# Bump when filter_tokens changes so cached token lists are recomputed
+TOKEN_FILTER_VERSION = 1
+try:
+    NLP_VERSION = f"{NLP_MODEL}-{version(NLP_MODEL)}-filter{TOKEN_FILTER_VERSION}"
+except PackageNotFoundError:
+    NLP_VERSION = f"{NLP_MODEL}-unknown-filter{TOKEN_FILTER_VERSION}"
 jk_api_key = os.getenv('JK_API_KEY')
+NLP_BATCH_SIZE = int(os.getenv('JK_NLP_BATCH_SIZE', '64'))
+NLP_PROCESSES = int(os.getenv('JK_NLP_PROCESSES', '1'))
+# 'nlp' keeps the nouns and verbs spaCy tags, 'fast' matches descriptions against the skills dictionary
+EXTRACTION_MODES = ('nlp', 'fast')
+EXTRACTION_MODE = os.getenv('JK_EXTRACTION_MODE', 'nlp')
+SKILLS_FILE = os.getenv('JK_SKILLS_FILE', os.path.join(os.path.dirname(__file__), 'data', 'skills.txt'))
+# 'tf' counts every mention, 'df' counts the job descriptions mentioning a word
+SKILL_COUNT_MODE = os.getenv('JK_SKILL_COUNT_MODE', 'tf')
+COUNT_LABELS = {'tf': '# of Mentions', 'df': '# of Job Descriptions'}
+# 'count' ranks the raw counts of the query's postings. 'tfidf' and 'logodds' rank terms by how much more
+# often the query's postings use them than the stored postings of every query (the background corpus),
+# so words every posting uses ("work", "team", "experience") sink whatever the stopword list says.
+# The scoring itself lives in app.distinctiveness, which needs scipy.
+SCORING_MODES = ('count', 'tfidf', 'logodds')
+SKILL_SCORING = os.getenv('JK_SKILL_SCORING', 'count')
+SCORE_LABELS = {'tfidf': 'Distinctiveness (TF-IDF)', 'logodds': 'Distinctiveness (log-odds z-score)'}
+
+# Chart rendering
+CHART_FORMATS = {'png': 'image/png', 'svg': 'image/svg+xml', 'webp': 'image/webp'}
+CHART_FORMAT = os.getenv('JK_CHART_FORMAT', 'png')
+CHART_DPI = int(os.getenv('JK_CHART_DPI', '100'))
+CHART_TOP_K = 15
+CHART_CACHE_MAX_ENTRIES = int(os.getenv('JK_CHART_CACHE_MAX_ENTRIES', '64'))
+
+_nlp = None
+_gazetteer = None
+_plotting = None
+_load_lock = threading.Lock()
+
+
+def get_nlp():
+    # Load core model, the filter only needs the tagger, attribute ruler and lemmatizer
+    global _nlp
+    if _nlp is None:
+        with _load_lock:
+            if _nlp is None:
+                spacy = timed_import('spacy')
+                started = time.perf_counter()
+                _nlp = spacy.load(NLP_MODEL, exclude=['parser', 'ner'])
+                startup_timings[f"load {NLP_MODEL}"] = time.perf_counter() - started
+    return _nlp
+
+
+def get_gazetteer():
+    # Compiled once per process from SKILLS_FILE
+    global _gazetteer
+    if _gazetteer is None:
+        with _load_lock:
+            if _gazetteer is None:
+                started = time.perf_counter()
+                _gazetteer = SkillGazetteer.from_file(SKILLS_FILE)
+                startup_timings["load skills dictionary"] = time.perf_counter() - started
+    return _gazetteer
+
+
+def get_plotting():
+    # matplotlib and seaborn are only imported for the first chart,
+    # the theme is global matplotlib state so it is applied once here and not per chart
+    global _plotting
+    if _plotting is None:
+        with _load_lock:
+            if _plotting is None:
+                figure = timed_import('matplotlib.figure')
+                backend = timed_import('matplotlib.backends.backend_agg')
+                sns = timed_import('seaborn')
+                sns.set_theme(style="whitegrid", font_scale=1.4)
+                _plotting = (figure.Figure, backend.FigureCanvasAgg, sns)
+    return _plotting
+
+
+def _reset_locks_after_fork():
+    # A fork while another thread holds a lock would leave it locked forever in the child
+    global _load_lock, _chart_cache_lock
+    _load_lock = threading.Lock()
+    _chart_cache_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_locks_after_fork)
+
+
+# SerpAPI fetching | every page of a search is requested in parallel over one pooled session
+SERPAPI_URL = os.getenv('JK_SERPAPI_URL', 'https://serpapi.com/search.json')
+SERPAPI_TIMEOUT_SECONDS = float(os.getenv('JK_SERPAPI_TIMEOUT', '20'))
+# the payload error of a query without results, the other payload errors are failures (quota, bad key)
+NO_RESULTS_ERROR = "hasn't returned any results"
+SERPAPI_RETRIES = int(os.getenv('JK_SERPAPI_RETRIES', '3'))
+SERPAPI_BACKOFF_SECONDS = float(os.getenv('JK_SERPAPI_BACKOFF', '0.5'))
+SERPAPI_MAX_CONNECTIONS = int(os.getenv('JK_SERPAPI_MAX_CONNECTIONS', '8'))
+# todo: does it make sense to user information from a user?
+DEFAULT_LOCATION = "New York, New York, United States"
+
+
+_serpapi_session = None
+
+
+def get_serpapi_session():
+    # One session per process so the TLS connections to SerpAPI are reused between searches
+    global _serpapi_session
+    if _serpapi_session is None:
+        retry = Retry(
+            total=SERPAPI_RETRIES,
+            backoff_factor=SERPAPI_BACKOFF_SECONDS,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(['GET']),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=SERPAPI_MAX_CONNECTIONS, pool_maxsize=SERPAPI_MAX_CONNECTIONS,
+                              max_retries=retry)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        _serpapi_session = session
+    return _serpapi_session
+
+
+def search_params(job_title, num, location=None):
+    return {
+        "engine": "google_jobs",
+        "google_domain": "google.com",
+        "q": f"{job_title}",
+        "gl": "us",
+        "hl": "en",
+        "chips": "date_posted;week",
+        "location": location or DEFAULT_LOCATION,
+        "api_key": jk_api_key,
+        "start": f"{num}"
+    }
+
+
+def describe_fetch_error(error):
+    # The messages of requests exceptions hold the request URL and with it the api_key, so only the
+    # status code or the exception class is logged
+    response = getattr(error, 'response', None)
+    if response is not None:
+        return f"HTTP {response.status_code}"
+    return type(error).__name__
+
+
+class FetchError(Exception):
+    # Every result page of a search failed. Pages the outbound scheduler held back are not failures.
+    pass
+
+
+def fetch_page(job_title, num, session=None, location=None, priority='interactive'):
+    # Returns the jobs of a single results page, an empty list when the outbound scheduler held the
+    # call back, or None when the page could not be fetched
+    if not scheduler.acquire(priority):
+        print(f"SerpAPI page start={num} for '{job_title}' skipped, {priority} budget or rate limit reached")
+        return []
+
+    session = session or get_serpapi_session()
+    SERPAPI_CALLS.inc()
+    with time_stage('fetch_page'):
+        try:
+            response = session.get(SERPAPI_URL, params=search_params(job_title, num, location),
+                                   timeout=SERPAPI_TIMEOUT_SECONDS)
+            response.raise_for_status()
+            results = response.json()
+        except (requests.RequestException, ValueError) as e:
+            SERPAPI_ERRORS.inc()
+            print(f"SerpAPI page start={num} for '{job_title}' failed: {describe_fetch_error(e)}")
+            return None
+
+    if 'error' in results:
+        # SerpAPI reports "no results" and quota problems in the payload, only the first is an answer
+        SERPAPI_ERRORS.inc()
+        print(f"SerpAPI page start={num} for '{job_title}' returned: {results['error']}")
+        if NO_RESULTS_ERROR not in results['error']:
+            return None
+    return results.get('jobs_results', [])
 
 
 # 1. Function to find the job descriptions of the listed job
-def get_jobs(start, job_title):
-    # Create an empty dataframe
-    job_data = pd.DataFrame()
-
-    for num in start:
-        params = {
-            "engine": "google_jobs",
-            "google_domain": "google.com",
-            "q": f"{job_title}",
-            "gl": "us",
-            "hl": "en",
-            "chips": "date_posted;week",
-            # todo: does it make sense to user information from a user?
-            "location": "New York, New York, United States",
-            "api_key": jk_api_key,
-            "start": f"{num}"
-        }
-        search = GoogleSearch(params)
-        results = search.get_dict()
-
-        # Put results into dataframe
-        jobs = pd.DataFrame.from_dict(results['jobs_results'])
-        # Append values to dataframe
-        job_data = pd.concat([jobs, job_data], ignore_index=True)
-
-    return job_data
+def get_jobs(start, job_title, location=None, priority='interactive'):
+    jobs, failed = get_jobs_many([(job_title, location)], start, priority)
+    if failed:
+        raise FetchError(f"Every SerpAPI page for '{job_title}' failed")
+    return jobs[(job_title, location)]
+
+
+def get_jobs_many(searches, start, priority='interactive'):
+    # Fetches the pages of several (job_title, location) searches over one connection pool. Returns
+    # {(job_title, location): job_data} and the set of searches whose every page failed: ranking the
+    # postings stored for those would pass an outage off as a result.
+    session = get_serpapi_session()
+    tasks = [(search, num) for search in searches for num in start]
+    with ThreadPoolExecutor(max_workers=max(1, min(len(tasks), SERPAPI_MAX_CONNECTIONS))) as executor:
+        pages = list(executor.map(lambda task: fetch_page(task[0][0], task[1], session, task[0][1], priority),
+                                  tasks))
+
+    # Put results into a single dataframe per search, keeping the page order
+    jobs = {search: [] for search in searches}
+    answered = set()
+    for (search, _), page in zip(tasks, pages):
+        if page is not None:
+            answered.add(search)
+            jobs[search].extend(page)
+    failed = {search for search, _ in tasks} - answered
+    return {search: pd.DataFrame.from_records(found) if found else pd.DataFrame(columns=['description'])
+            for search, found in jobs.items()}, failed
 
 
 # 2. With the job data in hand, extract the relevant job descriptions
-def clean_jobs(job_data):
-    # Find only the bullet points
-    descriptions = []
-    for i, _ in enumerate(job_data.description):
-        # Check that the job description is in string format
-        if isinstance(job_data.description[i], str) is True:
-            st = ' '.join(map(str, re.findall('•(.+)', job_data.description[i])))
-            descriptions.append(st)
-        else:
-            st = ''
-            descriptions.append(st)
-
-    job_data["descriptions_string"] = descriptions
+# Bullet points: • anywhere in a line, -, * and numbered items ("1." or "2)") at the start of one, and ·
+# separated lists ("Python · SQL · Tableau"), whose first item has no separator in front of it.
+# The other styles are rewritten to • first so the common case stays a single fast findall.
+BULLET_PATTERN = re.compile('•(.+)')
+LINE_BULLET_PATTERN = re.compile(r'\n[ \t]*(?:[-*]|\d{1,2}[.)])[ \t]')
+SEPARATED_LINE_PATTERN = re.compile('^(?=.*·)', re.MULTILINE)
+# Postings without bullets are split on sentence ends and line breaks instead
+SENTENCE_PATTERN = re.compile(r'[.!?]\s+|\n\s*')
+# Bump when clean_description changes so stored postings are processed again. 1 only kept • bullets,
+# 2 added the other bullet styles, the sentence fallback and · separated lists.
+CLEAN_VERSION = 2
+
+
+def clean_description(description):
+    # Check that the job description is in string format
+    if not isinstance(description, str):
+        return ''
+    if '·' in description:
+        # every item of the line becomes a bullet, the first one included
+        description = SEPARATED_LINE_PATTERN.sub('•', description).replace('·', '•')
+    description = LINE_BULLET_PATTERN.sub('\n•', '\n' + description)
+    bullets = BULLET_PATTERN.findall(description)
+    if bullets:
+        # Several bullets on one line end up in the same match
+        text = ' '.join(bullets).replace('•', ' ')
+    else:
+        text = ' '.join(SENTENCE_PATTERN.split(description))
     # Make all the text lower case
-    job_data["descriptions_string"] = job_data["descriptions_string"].str.lower()
+    return text.strip().lower()
 
-    return job_data["descriptions_string"]
 
+def iter_clean_jobs(descriptions):
+    # Streams cleaned descriptions straight into text_process without building a column
+    return (clean_description(description) for description in descriptions)
 
-def lemmatize_words(job_description):
+
+def clean_jobs(job_data):
+    # Find only the bullet points
+    return pd.Series(list(iter_clean_jobs(job_data['description'])), index=job_data.index,
+                     name='descriptions_string', dtype=object)
+
+
+def filter_tokens(document):
+    # Remove stopwords
+    all_stopwords = get_nlp().Defaults.stop_words
     result = []
-    # tokenize the sentence
-    document = sp(job_description)
     for word in document:
         if not word.is_punct and not word.like_num and not word.is_stop and not word.is_space and (
                 word.pos_ in ('NOUN', 'PROPN', 'VERB')) and word.lemma_ != 'datum':
@@ -83,53 +305,194 @@ def lemmatize_words(job_description):
     return result
 
 
+def lemmatize_words(job_description):
+    # tokenize the sentence
+    return filter_tokens(get_nlp()(job_description))
+
+
 # 3. Clean the text, prepare it for the words counts
-def text_process(job_descriptions):
-    lemmatize_docs = []
+def text_process(job_descriptions, batch_size=None, n_process=None, cache=None):
+    job_descriptions = list(job_descriptions)
+    if cache is None:
+        return lemmatize_batch(job_descriptions, batch_size, n_process)
+
+    # Only the descriptions we have never lemmatized go through the pipeline
+    keys = [description_key(doc) for doc in job_descriptions]
+    cached = cache.get_many(keys)
+    missing = {key: doc for key, doc in zip(keys, job_descriptions) if key not in cached}
+    if missing:
+        computed = dict(zip(missing, lemmatize_batch(list(missing.values()), batch_size, n_process)))
+        cache.put_many(computed)
+        cached.update(computed)
+
+    return [cached[key] for key in keys]
+
+
+def lemmatize_batch(job_descriptions, batch_size=None, n_process=None):
+    # Run the descriptions through the pipeline in batches, optionally spread over several processes.
+    # Empty descriptions have no tokens, they are not sent to spaCy at all.
+    non_empty = [doc for doc in job_descriptions if doc]
+    if not non_empty:
+        return [[] for _ in job_descriptions]
+    documents = get_nlp().pipe(
+        non_empty,
+        batch_size=batch_size or NLP_BATCH_SIZE,
+        n_process=n_process or NLP_PROCESSES
+    )
+    tokens = iter([filter_tokens(document) for document in documents])
+    return [next(tokens) if doc else [] for doc in job_descriptions]
+
+
+def match_skills(job_descriptions):
+    # Fast mode: the dictionary skills mentioned in each description, no tagging involved
+    gazetteer = get_gazetteer()
+    return [gazetteer.find(doc) if doc else [] for doc in job_descriptions]
 
-    for doc in job_descriptions:
-        lemmatize_docs.append(lemmatize_words(doc))
 
-    return lemmatize_docs
+def check_extraction_mode(mode):
+    mode = mode or EXTRACTION_MODE
+    if mode not in EXTRACTION_MODES:
+        raise ValueError(f"Unknown extraction mode '{mode}', expected one of {', '.join(EXTRACTION_MODES)}")
+    return mode
+
+
+def check_scoring_mode(mode):
+    mode = mode or SKILL_SCORING
+    if mode not in SCORING_MODES:
+        raise ValueError(f"Unknown scoring mode '{mode}', expected one of {', '.join(SCORING_MODES)}")
+    return mode
+
+
+def extraction_version(mode=None):
+    # Stored with every processed posting, counts made by another mode, dictionary or cleaning are recomputed
+    mode = check_extraction_mode(mode)
+    extraction = 'nlp' if mode == 'nlp' else f"fast-{get_gazetteer().version}"
+    return f"{extraction}-clean{CLEAN_VERSION}"
+
+
+def extract_skills(job_descriptions, mode=None, cache=None):
+    # Token lists per description, from the spaCy pipeline or the skills dictionary.
+    # The cache only applies to the spaCy pipeline, matching is cheaper than a lookup.
+    if check_extraction_mode(mode) == 'fast':
+        return match_skills(list(job_descriptions))
+    return text_process(job_descriptions, cache=cache)
 
 
 # 4. Find skills: With the job data, lemmatize and find the find_skills
-def find_skills(lemmatize_docs):
-    dictionary = gensim.corpora.Dictionary(lemmatize_docs)  # Create dictionary of all tokens
-    bow_corpus = [dictionary.doc2bow(doc, allow_update=True) for doc in
-                  lemmatize_docs]  # Run a BoW for each tokenized job description
-    id_words = [[(dictionary[id_word], count) for id_word, count in line] for line in
-                bow_corpus]  # Convert id to the actual words
-    flat_list = [item for sublist in id_words for item in sublist]  # Put all the list together
-    combined_list = list(
-        Counter(key for key, num in flat_list for idx in range(num)).items())  # Aggregate the value across all lists
-    skills = pd.DataFrame(combined_list, columns=['word', 'occurrences']).sort_values(by=['occurrences'],
-                                                                                      ascending=False,
-                                                                                      ignore_index=True)
-
-    return skills
+def find_skills(lemmatize_docs, top_k=None, mode=None):
+    mode = check_count_mode(mode)
+    combined = Counter()
+    for doc in lemmatize_docs:
+        # Counter.update counts an iterable in C, one pass and no per-occurrence expansion
+        combined.update(doc if mode == 'tf' else set(doc))
+
+    return rank_skills(combined, top_k)
+
+
+def count_tokens(lemmatize_docs):
+    # Per-posting token counts, the unit we store for every posting we have processed
+    return [dict(Counter(doc)) for doc in lemmatize_docs]
+
+
+def merge_skill_counts(posting_counts, top_k=None, mode=None):
+    # Rebuild the skill ranking from stored per-posting counts without re-running the NLP
+    return rank_skills(add_skill_counts(Counter(), posting_counts, mode), top_k)
+
+
+def add_skill_counts(combined, posting_counts, mode=None):
+    # Adds per-posting counts to a running total, so results can be merged page by page
+    mode = check_count_mode(mode)
+    for counts in posting_counts:
+        combined.update(counts if mode == 'tf' else counts.keys())
+    return combined
+
+
+def check_count_mode(mode):
+    mode = mode or SKILL_COUNT_MODE
+    if mode not in COUNT_LABELS:
+        raise ValueError(f"Unknown count mode '{mode}', expected one of {', '.join(COUNT_LABELS)}")
+    return mode
+
+
+def rank_skills(combined, top_k=None):
+    # Highest counts first, ties broken alphabetically so rankings are stable between runs
+    if top_k is None:
+        ranked = sorted(combined.items(), key=lambda item: (-item[1], item[0]))
+    else:
+        ranked = heapq.nsmallest(top_k, combined.items(), key=lambda item: (-item[1], item[0]))
+
+    return pd.DataFrame(ranked, columns=['word', 'occurrences'])
 
 
 # 5. Visualize the data
-def visualize(skills, project_id, bucket_name, gcs_file_name):
-    # Set the plot dimensions
-    a4_dims = (20, 9)
-    fig, ax = plt.subplots(figsize=a4_dims)
-    fig.set_layout_engine('compressed')
+_chart_cache = OrderedDict()
+_chart_cache_lock = threading.Lock()
+
 
-    sns.set_theme(style="whitegrid")
-    sns.set(font_scale=1.4)
+def chart_key(keys, vals, fmt, dpi, ylabel):
+    # Identical rankings give identical charts, so the rendered bytes are keyed by the plotted values
+    payload = json.dumps([keys, [round(float(val), 4) for val in vals], fmt, dpi, ylabel])
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
 
-    keys = list(skills.word[:15])
-    vals = list(skills.occurrences[:15])
-    pal = sns.color_palette("mako", len(vals))
 
-    ax.set(xlabel='Skill', ylabel='# of Job Descriptions')
-    ax.set_xticklabels(keys, rotation=30)
-    ax = sns.barplot(x=keys, y=vals, palette=pal)
+def render_chart(skills, fmt=None, dpi=None):
+    fmt = fmt or CHART_FORMAT
+    dpi = dpi or CHART_DPI
+    if fmt not in CHART_FORMATS:
+        raise ValueError(f"Unknown chart format '{fmt}', expected one of {', '.join(CHART_FORMATS)}")
+
+    keys = list(skills.word[:CHART_TOP_K])
+    vals = list((skills.score if 'score' in skills else skills.occurrences)[:CHART_TOP_K])
+    ylabel = SCORE_LABELS[SKILL_SCORING] if 'score' in skills else COUNT_LABELS[SKILL_COUNT_MODE]
+
+    key = chart_key(keys, vals, fmt, dpi, ylabel)
+    with _chart_cache_lock:
+        if key in _chart_cache:
+            _chart_cache.move_to_end(key)
+            return _chart_cache[key]
+
+    # Set the plot dimensions, a standalone Figure keeps pyplot's global state and its leaks out of the way
+    Figure, FigureCanvasAgg, sns = get_plotting()
+    a4_dims = (20, 9)
+    fig = Figure(figsize=a4_dims, layout='compressed')
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+
+    if keys:  # searches without any postings get an empty chart
+        pal = sns.color_palette("mako", len(vals))
+        sns.barplot(x=keys, y=vals, palette=pal, ax=ax)
+    ax.set(xlabel='Skill', ylabel=ylabel)
+    ax.tick_params(axis='x', labelrotation=30)
 
     # Save the plot to a buffer
-    # buf = BytesIO()
-    plt.savefig(gcs_file_name, format='png', dpi=300, transparent=True)
+    buf = BytesIO()
+    fig.savefig(buf, format=fmt, dpi=dpi, transparent=True)
+    image = buf.getvalue()
+
+    with _chart_cache_lock:
+        _chart_cache[key] = image
+        while len(_chart_cache) > CHART_CACHE_MAX_ENTRIES:
+            _chart_cache.popitem(last=False)
+
+    return image
+
+
+def visualize(skills, project_id, bucket_name, gcs_file_name):
+    with open(gcs_file_name, 'wb') as f:
+        f.write(render_chart(skills))
 
     return gcs_file_name
+
+
+def warm_up():
+    # Push one document through the extraction and draw one chart so the first real search is not a cold start
+    started = time.perf_counter()
+    extract_skills(['Build dashboards, write SQL queries and partner with the analytics team'])
+    startup_timings[f'warm-up {check_extraction_mode(None)}'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    render_chart(pd.DataFrame({'word': ['warm-up'], 'occurrences': [1]}))
+    startup_timings['warm-up chart'] = time.perf_counter() - started
+
+    if check_scoring_mode(None) != 'count':
+        timed_import('app.distinctiveness')  # scipy, for the term index
@@ -0,0 +1,69 @@
+"""Run a batch of searches through POST /search/batch, for the nightly reports.
+
+    python -m app.batch "data analyst" "data engineer" --location "Austin, Texas, United States"
+    python -m app.batch --file titles.txt --output report.json --refresh
+
+Titles come from the arguments and/or a file with one title per line. Every title is searched
+in every --location (the server's default location when none is given). The admin token is
+read from JK_AUTH_TOKEN and the server from JK_DOMAIN, like the server itself.
+"""
+import argparse
+import json
+import os
+import sys
+
+import requests
+
+
+def read_titles(args):
+    titles = list(args.titles)
+    if args.file:
+        with open(args.file) as f:
+            titles += [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    return titles
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('titles', nargs='*', help='job titles to search')
+    parser.add_argument('--file', default=None, help='file with one job title per line')
+    parser.add_argument('--location', action='append', default=[], help='may be given several times')
+    parser.add_argument('--refresh', action='store_true', help='recompute results that are still cached')
+    parser.add_argument('--url', default=os.getenv('JK_DOMAIN', 'http://localhost:8000'))
+    parser.add_argument('--token', default=os.getenv('JK_AUTH_TOKEN'))
+    parser.add_argument('--top', type=int, default=10, help='skills printed per search')
+    parser.add_argument('--output', default=None, help='write the full response to this JSON file')
+    parser.add_argument('--timeout', type=float, default=1800)
+    args = parser.parse_args()
+
+    titles = read_titles(args)
+    if not titles:
+        parser.error('no job titles given')
+
+    response = requests.post(
+        f"{args.url.rstrip('/')}/search/batch",
+        json={"searchTokens": titles, "locations": args.location, "refresh": args.refresh},
+        headers={"Authorization": f"Bearer {args.token}"},
+        timeout=args.timeout
+    )
+    response.raise_for_status()
+    data = response.json()
+    if 'error' in data:
+        print(data['error'], file=sys.stderr)
+        sys.exit(1)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(data, f, indent=2)
+
+    failed = 0
+    for result in data['results']:
+        skills = ', '.join(f"{skill['name']} ({skill['occurrences']})" for skill in result['skills'][:args.top])
+        print(f"{result['searchText']:<40} {result['status']:<7} {result['error'] or skills}")
+        failed += result['status'] == 'failed'
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+import contextlib
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from app.metrics import time_stage
+
+BASE_DIRECTORY = os.getenv('JK_BASE_DIR', '/opt/mnt')
+DATABASE_PATH = os.path.join(BASE_DIRECTORY, 'job-keywords.db')
+
+# WAL lets readers run while a writer commits, NORMAL sync is durable enough in WAL mode
+PRAGMAS = [
+    "pragma journal_mode = WAL",
+    "pragma synchronous = NORMAL",
+    "pragma busy_timeout = 5000",
+    "pragma temp_store = MEMORY",
+    "pragma cache_size = -16000",
+]
+
+_local = threading.local()
+
+
+def open_connection(path=DATABASE_PATH, check_same_thread=True):
+    connection = sqlite3.connect(path, check_same_thread=check_same_thread)
+    for pragma in PRAGMAS:
+        connection.execute(pragma)
+    return connection
+
+
+def get_connection():
+    # One connection per thread and per process, search workers are forked from the server process
+    connection = getattr(_local, 'connection', None)
+    if connection is None or _local.pid != os.getpid():
+        connection = open_connection()
+        _local.connection = connection
+        _local.pid = os.getpid()
+    return connection
+
+
+def close_connection():
+    # A process about to fork must not hand its open connection down to the children
+    connection = getattr(_local, 'connection', None)
+    if connection is not None and _local.pid == os.getpid():
+        connection.close()
+    _local.connection = None
+
+
+@contextlib.contextmanager
+def get_db_cursor():
+    cursor = get_connection().cursor()
+    try:
+        yield cursor
+    finally:
+        cursor.close()
+
+
+# Batches inserts on a background thread so they drop out of the request latency.
+# Rows are written once `batch_size` of them are queued or `flush_interval` seconds after the first one.
+class WriteBehindWriter:
+
+    def __init__(self, statement, batch_size=100, flush_interval=0.05, path=DATABASE_PATH):
+        self.statement = statement
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.path = path
+        self.written = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def add(self, row):
+        self._ensure_started()
+        self._queue.put(row)
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+                self._pid = os.getpid()
+                self._thread.start()
+
+    def _run(self):
+        connection = open_connection(self.path)
+        stopping = False
+        while not stopping:
+            row = self._queue.get()
+            if row is None:
+                break
+            batch = [row]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    row = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if row is None:
+                    stopping = True
+                    break
+                batch.append(row)
+            self._write(connection, batch)
+        connection.close()
+
+    def _write(self, connection, batch):
+        try:
+            with time_stage('db_write'), connection:
+                connection.executemany(self.statement, batch)
+            self.written += len(batch)
+        except sqlite3.Error as e:
+            print(f"Write-behind insert of {len(batch)} rows failed: {e!r}")
+
+    def close(self):
+        # Flushes everything queued so far and stops the writer thread
+        with self._lock:
+            thread = self._thread if self._pid == os.getpid() else None
+            self._thread = None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
@@ -0,0 +1,219 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+from app.app import check_scoring_mode, timed_import
+from app.db import get_connection
+
+sparse = timed_import('scipy.sparse')
+
+LOG_ODDS_PRIOR_SHARE = 0.01  # pseudo-counts of the log-odds prior, as a share of the corpus counts
+MIN_POSTINGS = 2  # a term must appear in at least this many of the query's postings to be ranked
+MAX_BLOCKS = 16  # row blocks kept side by side before they are compacted into one matrix
+SNAPSHOT_EVERY_ROWS = int(os.getenv('JK_TERM_INDEX_SNAPSHOT_ROWS', '500'))
+
+
+def tfidf_scores(tf, doc_freq, documents):
+    # Occurrences in the query's postings weighted by the inverse document frequency over all postings
+    return tf * np.log((1 + documents) / (1 + doc_freq))
+
+
+def log_odds_scores(tf, term_freq):
+    # z-scores of the log-odds ratio between the query's postings and the rest of the corpus, with the
+    # corpus frequencies as informative Dirichlet prior (Monroe, Colaresi and Quinn, "Fightin' Words", 2008)
+    rest = term_freq - tf
+    prior = term_freq * LOG_ODDS_PRIOR_SHARE
+    total, rest_total, prior_total = tf.sum(), rest.sum(), prior.sum()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        delta = (np.log((tf + prior) / (total + prior_total - tf - prior))
+                 - np.log((rest + prior) / (rest_total + prior_total - rest - prior)))
+        scores = delta / np.sqrt(1 / (tf + prior) + 1 / (rest + prior))
+    return np.nan_to_num(scores, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+# Term-document counts of the stored postings as a sparse matrix, one row per posting and one column per
+# vocabulary id, kept up to date incrementally: every sync appends the postings stored since the last one
+# as a new row block and updates the background frequencies. Scoring a query sums its rows, it never
+# rescans the postings table. Vocabulary ids live in the `vocabulary` table, so they are the same in every
+# process and across restarts, and the compacted matrix is snapshotted to disk under those ids.
+class TermIndex:
+
+    def __init__(self, snapshot_path=None):
+        self.snapshot_path = snapshot_path
+        self._lock = threading.Lock()
+        self._reset(None)
+
+    def _reset(self, version):
+        self.version = version
+        self._terms = [None]  # vocabulary id -> term, ids start at 1
+        self._term_ids = {}
+        self._blocks = []  # (first row, csr matrix) of consecutive rows
+        self._row_of = {}  # job_id -> row of its current counts, replaced postings leave a dead row behind
+        self._rows = 0
+        self._watermark = 0  # highest postings rowid synced
+        self._doc_freq = np.zeros(1, dtype=np.int64)  # live postings containing the term
+        self._term_freq = np.zeros(1, dtype=np.int64)  # occurrences in live postings
+        self._unsaved_rows = 0
+
+    @property
+    def documents(self):
+        return len(self._row_of)
+
+    def sync(self, version):
+        # Adds the postings stored since the last sync, for the extraction version in use
+        with self._lock:
+            if version != self.version:
+                self._reset(version)
+                self._load_snapshot()
+            connection = get_connection()
+            rows = connection.execute(
+                """
+                    select rowid, job_id, token_counts from postings
+                    where rowid > ? and extraction = ? and duplicate_of is null order by rowid
+                """,
+                (self._watermark, version)
+            ).fetchall()
+            if not rows:
+                return 0
+
+            postings = [(job_id, json.loads(token_counts)) for _, job_id, token_counts in rows]
+            new_terms = {term for _, counts in postings for term in counts if term not in self._term_ids}
+            if new_terms:
+                connection.executemany("insert or ignore into vocabulary (term) values (?)",
+                                       [(term,) for term in sorted(new_terms)])
+                connection.commit()
+                self._load_vocabulary(connection)
+            self._append(postings)
+            self._watermark = rows[-1][0]
+
+            self._unsaved_rows += len(postings)
+            if len(self._blocks) > MAX_BLOCKS:
+                self._compact()
+            if self.snapshot_path and self._unsaved_rows >= SNAPSHOT_EVERY_ROWS:
+                self._save_snapshot()
+            return len(postings)
+
+    def _load_vocabulary(self, connection):
+        for term_id, term in connection.execute("select id, term from vocabulary where id >= ? order by id",
+                                                (len(self._terms),)):
+            self._terms.extend([None] * (term_id - len(self._terms)))
+            self._terms.append(term)
+            self._term_ids[term] = term_id
+        grow = len(self._terms) - len(self._doc_freq)
+        if grow > 0:
+            self._doc_freq = np.pad(self._doc_freq, (0, grow))
+            self._term_freq = np.pad(self._term_freq, (0, grow))
+
+    def _append(self, postings):
+        indptr, indices, data = [0], [], []
+        for job_id, counts in postings:
+            if job_id in self._row_of:
+                self._retire(self._row_of[job_id])
+            self._row_of[job_id] = self._rows + len(indptr) - 1
+            indices.extend(self._term_ids[term] for term in counts)
+            data.extend(counts.values())
+            indptr.append(len(indices))
+        block = sparse.csr_matrix((np.array(data, dtype=np.int64), np.array(indices, dtype=np.int64), indptr),
+                                  shape=(len(postings), len(self._terms)))
+        block.sort_indices()
+        self._add_to_background(block, 1)
+        self._blocks.append((self._rows, block))
+        self._rows += len(postings)
+
+    def _add_to_background(self, matrix, sign):
+        width = matrix.shape[1]
+        self._doc_freq[:width] += sign * np.bincount(matrix.indices, minlength=width)
+        self._term_freq[:width] += sign * np.bincount(matrix.indices, weights=matrix.data,
+                                                      minlength=width).astype(np.int64)
+
+    def _retire(self, row):
+        for start, block in self._blocks:
+            if start <= row < start + block.shape[0]:
+                self._add_to_background(block[row - start], -1)
+                return
+
+    def _stacked(self):
+        width = len(self._terms)
+        blocks = []
+        for _, block in self._blocks:
+            block.resize((block.shape[0], width))
+            blocks.append(block)
+        return sparse.vstack(blocks, format='csr') if blocks else sparse.csr_matrix((0, width), dtype=np.int64)
+
+    def _compact(self):
+        # One matrix holding the live rows only, in the order of their job ids' rows
+        job_ids = sorted(self._row_of, key=self._row_of.get)
+        matrix = self._stacked()[np.array([self._row_of[job_id] for job_id in job_ids], dtype=np.int64)]
+        self._blocks = [(0, matrix.tocsr())]
+        self._row_of = {job_id: row for row, job_id in enumerate(job_ids)}
+        self._rows = len(job_ids)
+
+    def _save_snapshot(self):
+        self._compact()
+        matrix = self._blocks[0][1]
+        job_ids = sorted(self._row_of, key=self._row_of.get)
+        temporary_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+        with open(temporary_path, 'wb') as f:
+            np.savez(f, version=np.array(self.version), watermark=np.array(self._watermark),
+                     job_ids=np.array(job_ids, dtype=str), shape=np.array(matrix.shape),
+                     data=matrix.data, indices=matrix.indices, indptr=matrix.indptr)
+        os.replace(temporary_path, self.snapshot_path)
+        self._unsaved_rows = 0
+
+    def _load_snapshot(self):
+        self._load_vocabulary(get_connection())
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with np.load(self.snapshot_path, allow_pickle=False) as snapshot:
+                if str(snapshot['version']) != self.version:
+                    return
+                matrix = sparse.csr_matrix((snapshot['data'], snapshot['indices'], snapshot['indptr']),
+                                           shape=tuple(snapshot['shape']))
+                job_ids = snapshot['job_ids'].tolist()
+                watermark = int(snapshot['watermark'])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring the term index snapshot {self.snapshot_path}: {e!r}")
+            return
+        if matrix.shape[1] > len(self._terms):
+            # written against a vocabulary this database does not have
+            return
+        matrix.resize((matrix.shape[0], len(self._terms)))
+        self._blocks = [(0, matrix)]
+        self._row_of = {job_id: row for row, job_id in enumerate(job_ids)}
+        self._rows = len(job_ids)
+        self._watermark = watermark
+        self._add_to_background(matrix, 1)
+
+    def _foreground(self, rows):
+        # Occurrences and posting counts of every term over the given rows
+        width = len(self._terms)
+        tf = np.zeros(width, dtype=np.int64)
+        df = np.zeros(width, dtype=np.int64)
+        for start, block in self._blocks:
+            local = rows[(rows >= start) & (rows < start + block.shape[0])] - start
+            if local.size:
+                selected = block[local]
+                tf[:selected.shape[1]] += np.asarray(selected.sum(axis=0)).ravel()
+                df[:selected.shape[1]] += np.bincount(selected.indices, minlength=selected.shape[1])
+        return tf, df
+
+    def score(self, job_ids, mode=None, count_mode='tf', top_k=None):
+        # [(term, occurrences, score)] of the terms distinctive for the postings, best first. Occurrences are
+        # mentions or postings depending on count_mode, as in the count ranking.
+        mode = check_scoring_mode(mode)
+        with self._lock:
+            rows = np.array(sorted({self._row_of[job_id] for job_id in job_ids if job_id in self._row_of}),
+                            dtype=np.int64)
+            tf, df = self._foreground(rows)
+            if mode == 'tfidf':
+                scores = tfidf_scores(tf, self._doc_freq, self.documents)
+            else:
+                scores = log_odds_scores(tf, self._term_freq)
+            candidates = np.flatnonzero((df >= min(MIN_POSTINGS, rows.size)) & (df > 0) & (scores > 0))
+            counts = tf if count_mode == 'tf' else df
+            ranked = sorted(((self._terms[term_id], int(counts[term_id]), round(float(scores[term_id]), 4))
+                             for term_id in candidates), key=lambda item: (-item[2], item[0]))
+        return ranked if top_k is None else ranked[:top_k]
@@ -0,0 +1,122 @@
+import hashlib
+import re
+from collections import deque
+
+# Lower-cased words, keeping the symbols of names like c++, c#, node.js and ci/cd apart from punctuation
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#]*(?:[./][a-z0-9]+)*[+#]*")
+LOOKUP_MAX_ENTRIES = 200000
+
+
+def normalize_token(token):
+    # Crude plural folding, applied to the dictionary and the text alike so both sides agree
+    if len(token) > 4 and token.endswith('ies'):
+        return token[:-3] + 'y'
+    if token.endswith('sses'):
+        return token[:-2]
+    if len(token) > 3 and token.endswith('s') and not token.endswith(('ss', 'us', 'is')):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    return [normalize_token(token) for token in TOKEN_PATTERN.findall(text.lower())]
+
+
+def read_skills_file(path):
+    # One skill per line, optionally followed by aliases: "machine learning | ml". Lines starting with # are comments.
+    entries = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            names = [name.strip() for name in line.split('|') if name.strip()]
+            entries.append((names[0], names))
+    return entries
+
+
+# Aho-Corasick automaton over word tokens: every skill phrase of the dictionary is found in one pass
+# over the description, whatever the number of phrases. Overlapping matches are resolved
+# leftmost-longest, so "machine learning" is not also counted as "learning".
+class SkillGazetteer:
+
+    def __init__(self, entries):
+        # Matches are stored per posting, the version tells when they were made with another dictionary
+        self.version = hashlib.sha1(repr(entries).encode('utf-8')).hexdigest()[:12]
+        self.size = 0
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [None]  # (skill, phrase length) of the longest phrase ending in the state
+        self._lookup = {}  # word of a description -> its normalized form, None when no phrase uses it
+        for skill, phrases in entries:
+            for phrase in phrases:
+                tokens = tokenize(phrase)
+                if tokens:
+                    self._add(tokens, skill)
+        self._build_failure_links()
+        self._vocabulary = {token for transitions in self._goto for token in transitions}
+
+    @classmethod
+    def from_file(cls, path):
+        return cls(read_skills_file(path))
+
+    def _add(self, tokens, skill):
+        state = 0
+        for token in tokens:
+            following = self._goto[state].get(token)
+            if following is None:
+                following = len(self._goto)
+                self._goto[state][token] = following
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(None)
+            state = following
+        if self._output[state] is None:
+            self.size += 1
+        self._output[state] = (skill, len(tokens))
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, following in self._goto[state].items():
+                queue.append(following)
+                fallback = self._fail[state]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[following] = self._goto[fallback].get(token, 0)
+                if self._output[following] is None:
+                    self._output[following] = self._output[self._fail[following]]
+
+    def _normalize(self, word):
+        if len(self._lookup) > LOOKUP_MAX_ENTRIES:
+            self._lookup.clear()
+        token = normalize_token(word)
+        self._lookup[word] = token = token if token in self._vocabulary else None
+        return token
+
+    def find(self, text):
+        # Skills mentioned in the text, once per mention, in order of appearance
+        goto, fail, output, lookup = self._goto, self._fail, self._output, self._lookup
+        matches = []
+        state = 0
+        for position, word in enumerate(TOKEN_PATTERN.findall(text.lower())):
+            token = lookup[word] if word in lookup else self._normalize(word)
+            if token is None:
+                # no phrase contains the word, every partial match ends here
+                state = 0
+                continue
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            if output[state] is not None:
+                skill, length = output[state]
+                start = position - length + 1
+                # the phrase replaces the shorter matches inside it, unless an earlier match overlaps it
+                inside = len(matches)
+                while inside and matches[inside - 1][0] >= start:
+                    inside -= 1
+                if not inside or matches[inside - 1][1] < start:
+                    del matches[inside:]
+                    matches.append((start, position, skill))
+        return [skill for _, _, skill in matches]
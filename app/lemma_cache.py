@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from app.metrics import LEMMA_CACHE_LOOKUPS
+
+DEFAULT_MAX_ENTRIES = 200000
+
+
+def description_key(description):
+    # Content address of a cleaned description, as produced by clean_jobs
+    return hashlib.sha1(description.encode('utf-8')).hexdigest()
+
+
+# Size-bounded LRU of lemmatized token lists, stored in a sidecar SQLite file.
+# Entries are only valid for the version they were written with, so changing the
+# spaCy model or the token filter drops the cached lists on the next open.
+class LemmaCache:
+    def __init__(self, path, version, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.version = version
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+
+    def _connect(self):
+        # sqlite connections must not cross a fork, reopen in every process
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute(
+                """
+                    create table if not exists lemma_meta (
+                        name TEXT not null primary key,
+                        value TEXT not null
+                    )
+                """
+            )
+            connection.execute(
+                """
+                    create table if not exists lemmas (
+                        key TEXT not null primary key,
+                        tokens TEXT not null,
+                        last_used REAL not null
+                    )
+                """
+            )
+            connection.execute("create index if not exists lemmas_last_used on lemmas (last_used)")
+            row = connection.execute("select value from lemma_meta where name = 'version'").fetchone()
+            if row is None or row[0] != self.version:
+                connection.execute("delete from lemmas")
+                connection.execute("insert or replace into lemma_meta (name, value) values ('version', ?)",
+                                   (self.version,))
+            connection.commit()
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    def get_many(self, keys):
+        # Returns {key: tokens} for the keys that are cached and refreshes their position in the LRU
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        with self._lock:
+            connection = self._connect()
+            for offset in range(0, len(unique_keys), 500):
+                chunk = unique_keys[offset:offset + 500]
+                rows = connection.execute(
+                    f"select key, tokens from lemmas where key in ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall()
+                found.update((key, json.loads(tokens)) for key, tokens in rows)
+            if found:
+                now = time.time()
+                connection.executemany("update lemmas set last_used = ? where key = ?",
+                                       [(now, key) for key in found])
+                connection.commit()
+            hits = sum(1 for key in keys if key in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        # exported through app.metrics, which forwards the counts of search workers to the server
+        if hits:
+            LEMMA_CACHE_LOOKUPS.inc(hits, result='hit')
+        if len(keys) > hits:
+            LEMMA_CACHE_LOOKUPS.inc(len(keys) - hits, result='miss')
+        return found
+
+    def put_many(self, entries):
+        if not entries:
+            return
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            connection.executemany(
+                "insert or replace into lemmas (key, tokens, last_used) values (?, ?, ?)",
+                [(key, json.dumps(tokens), now) for key, tokens in entries.items()]
+            )
+            # Evict the least recently used lists once the cache outgrows its bound
+            (count,) = connection.execute("select count(*) from lemmas").fetchone()
+            if count > self.max_entries:
+                connection.execute(
+                    "delete from lemmas where key in (select key from lemmas order by last_used limit ?)",
+                    (count - self.max_entries,)
+                )
+            connection.commit()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": self.hits / lookups if lookups else 0.0
+        }
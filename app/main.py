@@ -1,13 +1,23 @@
+import time
+
+IMPORT_STARTED = time.perf_counter()
+
+import asyncio
 import json
 import os
+import re
+import threading
 import uuid
-from datetime import datetime, timezone
-from typing import List
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
 
-import contextlib
+import hashlib
 
+import numpy
 import pandas
-from dateutil.parser import parse
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
@@ -17,46 +27,85 @@ from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from slowapi.util import get_remote_address
 
-import sqlite3
-
-from starlette.responses import RedirectResponse
+from starlette.responses import JSONResponse, RedirectResponse, Response, StreamingResponse
 
 from app.app import (
-    find_skills,
+    CHART_FORMAT,
+    COUNT_LABELS,
+    DEFAULT_LOCATION,
+    EXTRACTION_MODE,
+    NLP_VERSION,
+    add_skill_counts,
+    check_count_mode,
+    check_scoring_mode,
+    count_tokens,
+    extract_skills,
+    extraction_version,
     get_jobs,
+    get_jobs_many,
     clean_jobs,
-    text_process,
-    visualize
+    merge_skill_counts,
+    rank_skills,
+    render_chart,
+    startup_timings,
+    warm_up
 )
+from app.db import WriteBehindWriter, get_connection, get_db_cursor, open_connection
+from app import metrics, scheduler
+from app.lemma_cache import LemmaCache, description_key
+from app.metrics import CACHE_LOOKUPS, COALESCED_SEARCHES, NEAR_DUPLICATES, Gauge, render_metrics, time_stage
+from app.near_duplicates import DEFAULT_THRESHOLD, buckets, find_near_duplicates, signature
 
 # Configuration
 BASE_DIRECTORY = os.getenv('JK_BASE_DIR', '/opt/mnt')
 STATIC_DIRECTORY = os.path.join(BASE_DIRECTORY, 'static')
+CHART_DIRECTORY = os.path.join(STATIC_DIRECTORY, 'charts')  # charts stored once under their content hash
+IMAGE_GC_GRACE_SECONDS = int(os.getenv('JK_IMAGE_GC_GRACE_SECONDS', '3600'))
+LEGACY_IMAGE_PATTERN = re.compile(r'^(cached_)?[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\.(png|svg|webp)$')
 DOMAIN = os.getenv('JK_DOMAIN', 'http://localhost:8000')
 AUTH_TOKEN = os.getenv('JK_AUTH_TOKEN', None)
-MAX_CACHE_AGE_SECONDS = 43200  # 12 hours
-
-connection = sqlite3.connect(os.path.join(BASE_DIRECTORY, 'job-keywords.db'))
+MAX_CACHE_AGE_SECONDS = 43200  # 12 hours, older entries are served while they are refreshed in the background
+HARD_MAX_CACHE_AGE_SECONDS = int(os.getenv('JK_HARD_MAX_CACHE_AGE_SECONDS', '172800'))  # 48 hours, never served
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv('JK_RESULT_CACHE_MAX_ENTRIES', '256'))
+# How often the in-memory cache checks whether another process cleared cached_requests
+CACHE_GENERATION_CHECK_SECONDS = float(os.getenv('JK_CACHE_GENERATION_CHECK_SECONDS', '1'))
+SEARCH_PAGES = [0, 10, 20, 30]
+POSTING_WINDOW = timedelta(days=7)  # matches the date_posted;week chip of the search
+LEMMA_CACHE_MAX_ENTRIES = int(os.getenv('JK_LEMMA_CACHE_MAX_ENTRIES', '200000'))
+# Estimated Jaccard similarity of the description shingles above which a new posting is counted as a copy
+# of one seen before, 0 turns near-duplicate detection off
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv('JK_NEAR_DUPLICATE_THRESHOLD', str(DEFAULT_THRESHOLD)))
+
+SEARCH_WORKERS = int(os.getenv('JK_SEARCH_WORKERS', '2'))
+MAX_QUEUED_SEARCHES = int(os.getenv('JK_MAX_QUEUED_SEARCHES', '16'))
+SEARCH_LEASE_SECONDS = int(os.getenv('JK_SEARCH_LEASE_SECONDS', '180'))
+SEARCH_LEASE_POLL_SECONDS = 0.5
+REQUEST_LOG_BATCH_SIZE = int(os.getenv('JK_REQUEST_LOG_BATCH_SIZE', '100'))
+REQUEST_LOG_FLUSH_MS = int(os.getenv('JK_REQUEST_LOG_FLUSH_MS', '50'))
+EXPORT_PAGE_SIZE = 100
+EXPORT_MAX_PAGE_SIZE = 1000
+EXPORT_FETCH_SIZE = 500
+RATE_LIMIT_STORAGE = os.getenv('JK_RATE_LIMIT_STORAGE', 'memory://')  # e.g. redis:// to share limits between workers
+TREND_MAX_DAYS = 365
+TREND_MAX_TOP = 500
+TREND_MIN_POSTINGS = 2  # risers need the skill in at least this many postings of the current window
+STREAM_MEDIA_TYPES = {"sse": "text/event-stream", "ndjson": "application/x-ndjson"}
+MAX_BATCH_SEARCHES = int(os.getenv('JK_MAX_BATCH_SEARCHES', '100'))
+STREAM_TOP_K = 30  # skills sent with each partial ranking, the page lists 30 of them
+
+lemma_cache = LemmaCache(os.path.join(BASE_DIRECTORY, 'lemma-cache.db'), NLP_VERSION, LEMMA_CACHE_MAX_ENTRIES)
+_term_index = None
 
 
 def create_static_dir_if_not_exists():
-    if not os.path.exists(STATIC_DIRECTORY):
-        os.makedirs(STATIC_DIRECTORY)
+    if not os.path.exists(CHART_DIRECTORY):
+        os.makedirs(CHART_DIRECTORY)
     print(f"Static directory: {os.path.abspath(STATIC_DIRECTORY)}")
 
 
 create_static_dir_if_not_exists()
 
 
-@contextlib.contextmanager
-def get_db_cursor():
-    cursor = connection.cursor()
-    try:
-        yield cursor
-    finally:
-        cursor.close()
-
-
 def create_db_tables():
     with get_db_cursor() as cursor:
         cursor.execute(
@@ -70,16 +119,41 @@ def create_db_tables():
                 )
             """
         )
+        cursor.execute(
+            """
+                create index if not exists requests_created_at on requests (created_at)
+            """
+        )
+        cursor.execute(
+            """
+                create index if not exists requests_search_text on requests (search_text)
+            """
+        )
         cursor.execute(
             """
                 create table if not exists cached_requests (
                     search_text TEXT not null primary key, 
                     skills TEXT not null,
                     image_url TEXT not null,
-                    created_at not null
+                    created_at not null,
+                    payload TEXT null
+                )
+            """
+        )
+        # payload: the skills list of the search response, serialized once when the entry is written
+        cursor.execute("pragma table_info(cached_requests)")
+        if "payload" not in {row[1] for row in cursor.fetchall()}:
+            cursor.execute("alter table cached_requests add column payload TEXT null")
+        # Bumped whenever cached_requests is cleared, so every server process drops its in-memory copies
+        cursor.execute(
+            """
+                create table if not exists cache_generation (
+                    id INTEGER not null primary key check (id = 0),
+                    generation INTEGER not null
                 )
             """
         )
+        cursor.execute("insert or ignore into cache_generation (id, generation) values (0, 0)")
         cursor.execute(
             """
                 create table if not exists feedback_records (
@@ -91,70 +165,695 @@ def create_db_tables():
                 )
             """
         )
-        connection.commit()
+        cursor.execute(
+            """
+                create table if not exists postings (
+                    job_id TEXT not null primary key,
+                    description TEXT not null,
+                    token_counts TEXT not null,
+                    created_at not null,
+                    extraction TEXT not null default 'nlp'
+                )
+            """
+        )
+        cursor.execute("pragma table_info(postings)")
+        posting_columns = {row[1] for row in cursor.fetchall()}
+        if "extraction" not in posting_columns:
+            cursor.execute("alter table postings add column extraction TEXT not null default 'nlp'")
+        # Near-duplicates keep the token counts of the posting they copy and point at it in duplicate_of,
+        # queries count every such group once. signature is the MinHash of the description.
+        if "duplicate_of" not in posting_columns:
+            cursor.execute("alter table postings add column duplicate_of TEXT null")
+        if "signature" not in posting_columns:
+            cursor.execute("alter table postings add column signature BLOB null")
+        # description is the cleaned text the counts were made from, raw_description the SerpAPI description
+        # as fetched, so the postings can be processed again when the cleaning rules change. It is null for
+        # postings stored before it existed.
+        if "raw_description" not in posting_columns:
+            cursor.execute("alter table postings add column raw_description TEXT null")
+        cursor.execute(
+            """
+                create table if not exists posting_buckets (
+                    bucket INTEGER not null,
+                    job_id TEXT not null,
+                    primary key (bucket, job_id)
+                )
+            """
+        )
+        # Stable ids of the terms found in postings, the columns of the distinctiveness term index
+        cursor.execute(
+            """
+                create table if not exists vocabulary (
+                    id INTEGER primary key autoincrement,
+                    term TEXT not null unique
+                )
+            """
+        )
+        cursor.execute(
+            """
+                create table if not exists query_postings (
+                    search_text TEXT not null,
+                    job_id TEXT not null,
+                    first_seen_at not null,
+                    last_seen_at not null,
+                    primary key (search_text, job_id)
+                )
+            """
+        )
+        # Daily rollups: every posting is counted once, on the day it was first seen for the query,
+        # so the totals of any range of days are the sums of its daily rows
+        cursor.execute(
+            """
+                create table if not exists daily_skill_counts (
+                    search_text TEXT not null,
+                    day TEXT not null,
+                    skill TEXT not null,
+                    occurrences INTEGER not null,
+                    postings INTEGER not null,
+                    primary key (search_text, day, skill)
+                )
+            """
+        )
+        cursor.execute(
+            """
+                create table if not exists daily_query_postings (
+                    search_text TEXT not null,
+                    day TEXT not null,
+                    postings INTEGER not null,
+                    primary key (search_text, day)
+                )
+            """
+        )
+        cursor.execute("select 1 from daily_query_postings limit 1")
+        if cursor.fetchone() is None:
+            # First start with the rollups, fill them from the postings seen so far
+            cursor.execute(
+                """
+                    insert into daily_skill_counts (search_text, day, skill, occurrences, postings)
+                    select q.search_text, substr(q.first_seen_at, 1, 10), j.key, sum(j.value), count(*)
+                    from query_postings q
+                    join postings p on p.job_id = q.job_id, json_each(p.token_counts) j
+                    group by 1, 2, 3
+                """
+            )
+            cursor.execute(
+                """
+                    insert into daily_query_postings (search_text, day, postings)
+                    select search_text, substr(first_seen_at, 1, 10), count(*) from query_postings group by 1, 2
+                """
+            )
+        cursor.execute(
+            """
+                create table if not exists search_tasks (
+                    id TEXT not null primary key,
+                    search_text TEXT not null,
+                    status TEXT not null,
+                    result TEXT null,
+                    error TEXT null,
+                    created_at not null,
+                    updated_at not null
+                )
+            """
+        )
+        cursor.execute(
+            """
+                create table if not exists search_leases (
+                    search_text TEXT not null primary key,
+                    owner TEXT not null,
+                    expires_at not null
+                )
+            """
+        )
+        cursor.connection.commit()
 
 
 create_db_tables()
 
 
-def get_cached_request(search_text):
+def get_known_posting_ids(job_ids):
+    known = set()
     with get_db_cursor() as cursor:
+        for offset in range(0, len(job_ids), 500):
+            chunk = job_ids[offset:offset + 500]
+            cursor.execute(
+                f"""
+                    select job_id from postings where job_id in ({','.join('?' * len(chunk))}) and extraction = ?
+                """,
+                chunk + [extraction_version()]
+            )
+            known.update(row[0] for row in cursor.fetchall())
+    return known
+
+
+def get_posting_token_counts(job_ids):
+    # {job_id: token_counts} of the postings we have already processed, near-duplicates under the id of
+    # the posting they copy
+    counts = {}
+    with get_db_cursor() as cursor:
+        for offset in range(0, len(job_ids), 500):
+            chunk = job_ids[offset:offset + 500]
+            cursor.execute(
+                f"""
+                    select coalesce(duplicate_of, job_id), token_counts from postings
+                    where job_id in ({','.join('?' * len(chunk))}) and extraction = ?
+                """,
+                chunk + [extraction_version()]
+            )
+            counts.update((job_id, json.loads(token_counts)) for job_id, token_counts in cursor.fetchall())
+    return counts
+
+
+def get_bucket_candidates(job_buckets):
+    # {bucket: [(job_id, signature)]} of the stored postings sharing an LSH bucket with the new ones.
+    # Only postings that are not duplicates themselves have buckets.
+    candidates = {}
+    job_buckets = list(job_buckets)
+    with get_db_cursor() as cursor:
+        for offset in range(0, len(job_buckets), 500):
+            chunk = job_buckets[offset:offset + 500]
+            cursor.execute(
+                f"""
+                    select b.bucket, p.job_id, p.signature from posting_buckets b
+                    join postings p on p.job_id = b.job_id
+                    where b.bucket in ({','.join('?' * len(chunk))}) and p.extraction = ?
+                        and p.duplicate_of is null and p.signature is not null
+                """,
+                chunk + [extraction_version()]
+            )
+            for bucket, job_id, job_signature in cursor.fetchall():
+                candidates.setdefault(bucket, []).append((job_id, numpy.frombuffer(job_signature, dtype=numpy.uint32)))
+    return candidates
+
+
+def get_outdated_postings(search_texts):
+    # (job_id, SerpAPI description) of the postings in the queries' search windows that were processed
+    # under another extraction version, leaving out those stored before descriptions were kept
+    outdated = []
+    with get_db_cursor() as cursor:
+        for offset in range(0, len(search_texts), 500):
+            chunk = search_texts[offset:offset + 500]
+            cursor.execute(
+                f"""
+                    select distinct p.job_id, p.raw_description from query_postings q
+                    join postings p on p.job_id = q.job_id
+                    where q.search_text in ({','.join('?' * len(chunk))}) and q.last_seen_at > ?
+                        and p.extraction != ? and p.raw_description is not null
+                """,
+                chunk + [datetime.now(timezone.utc) - POSTING_WINDOW, extraction_version()]
+            )
+            outdated.extend(cursor.fetchall())
+    return outdated
+
+
+def save_postings(new_postings, seen_job_ids):
+    # new_postings: [(job_id, description, token_counts, duplicate_of, signature, raw_description)] for
+    # postings processed in this refresh, seen_job_ids: {search_text: job ids on its result pages}
+    # Postings processed with another extraction mode are replaced
+    now = datetime.now(timezone.utc)
+    extraction = extraction_version()
+    connection = get_connection()
+    # The write lock is taken up front. In a deferred transaction the first-seen reads would have to be
+    # upgraded to a write, which SQLite refuses without waiting once another connection has committed.
+    connection.execute("begin immediate")
+    try:
+        with get_db_cursor() as cursor:
+            cursor.executemany(
+                """
+                    insert or replace into postings 
+                        (job_id, description, token_counts, created_at, extraction, duplicate_of, signature,
+                         raw_description) 
+                    values (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                [(job_id, description, json.dumps(counts), now, extraction, duplicate_of,
+                  None if job_signature is None else job_signature.tobytes(), raw_description)
+                 for job_id, description, counts, duplicate_of, job_signature, raw_description in new_postings]
+            )
+            cursor.executemany(
+                "insert or ignore into posting_buckets (bucket, job_id) values (?, ?)",
+                [(bucket, job_id) for job_id, _, _, duplicate_of, job_signature, _ in new_postings
+                 if duplicate_of is None and job_signature is not None for bucket in buckets(job_signature)]
+            )
+            for search_text, job_ids in seen_job_ids.items():
+                first_seen = first_seen_job_ids(cursor, search_text, job_ids)
+                add_daily_rollups(cursor, search_text, now.date().isoformat(), first_seen)
+            cursor.executemany(
+                """
+                    insert into query_postings (search_text, job_id, first_seen_at, last_seen_at) 
+                    values (?, ?, ?, ?)
+                    on conflict (search_text, job_id) do update set last_seen_at = excluded.last_seen_at
+                """,
+                [(search_text, job_id, now, now)
+                 for search_text, job_ids in seen_job_ids.items() for job_id in job_ids]
+            )
+        connection.commit()
+    finally:
+        if connection.in_transaction:
+            connection.rollback()
+
+
+def first_seen_job_ids(cursor, search_text, job_ids):
+    # The postings that were never on the query's result pages before, leaving out near-duplicates of
+    # postings already counted for the query
+    job_ids = list(job_ids)
+    seen = set()
+    groups = {}
+    for offset in range(0, len(job_ids), 500):
+        chunk = job_ids[offset:offset + 500]
+        cursor.execute(
+            f"""
+                select job_id from query_postings where search_text = ? and job_id in ({','.join('?' * len(chunk))})
+            """,
+            [search_text] + chunk
+        )
+        seen.update(row[0] for row in cursor.fetchall())
+        cursor.execute(
+            f"""
+                select job_id, coalesce(duplicate_of, job_id) from postings 
+                where job_id in ({','.join('?' * len(chunk))})
+            """,
+            chunk
+        )
+        groups.update(cursor.fetchall())
+
+    first_seen = [job_id for job_id in job_ids if job_id not in seen]
+    new_groups = list({groups.get(job_id, job_id) for job_id in first_seen})
+    counted = set()
+    for offset in range(0, len(new_groups), 500):
+        chunk = new_groups[offset:offset + 500]
+        cursor.execute(
+            f"""
+                select coalesce(p.duplicate_of, p.job_id) from query_postings q
+                join postings p on p.job_id = q.job_id
+                where q.search_text = ? and coalesce(p.duplicate_of, p.job_id) in ({','.join('?' * len(chunk))})
+            """,
+            [search_text] + chunk
+        )
+        counted.update(row[0] for row in cursor.fetchall())
+
+    result = []
+    for job_id in first_seen:
+        group = groups.get(job_id, job_id)
+        if group not in counted:
+            counted.add(group)
+            result.append(job_id)
+    return result
+
+
+def add_daily_rollups(cursor, search_text, day, job_ids):
+    # Adds the token counts of postings first seen today to the query's daily rollup, in SQL so the
+    # stored counts are not parsed in Python. Runs inside the transaction of save_postings.
+    if not job_ids:
+        return
+    for offset in range(0, len(job_ids), 500):
+        chunk = job_ids[offset:offset + 500]
+        cursor.execute(
+            f"""
+                insert into daily_skill_counts (search_text, day, skill, occurrences, postings)
+                select ?, ?, j.key, sum(j.value), count(*)
+                from postings p, json_each(p.token_counts) j
+                where p.job_id in ({','.join('?' * len(chunk))})
+                group by j.key
+                on conflict (search_text, day, skill) do update set
+                    occurrences = occurrences + excluded.occurrences,
+                    postings = postings + excluded.postings
+            """,
+            [search_text, day] + chunk
+        )
+    cursor.execute(
+        """
+            insert into daily_query_postings (search_text, day, postings) values (?, ?, ?)
+            on conflict (search_text, day) do update set postings = postings + excluded.postings
+        """,
+        (search_text, day, len(job_ids))
+    )
+
+
+def trend_days(days, until=None):
+    # First and last day of a window of `days` days ending today
+    until = until or datetime.now(timezone.utc).date()
+    return (until - timedelta(days=days - 1)).isoformat(), until.isoformat()
+
+
+def get_skill_trend(search_text, days, top_k=None, mode=None):
+    # Top skills over the last `days` days, merged from the daily rollups
+    mode = check_count_mode(mode)
+    since, until = trend_days(days)
+    column = "occurrences" if mode == "tf" else "postings"
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            f"""
+                select skill, sum({column}) as total from daily_skill_counts
+                where search_text = ? and day >= ? and day <= ?
+                group by skill order by total desc, skill limit ?
+            """,
+            (search_text, since, until, -1 if top_k is None else top_k)
+        )
+        skills = [{"name": skill, "occurrences": total} for skill, total in cursor.fetchall()]
         cursor.execute(
             """
-                select skills, image_url, created_at from cached_requests where search_text = ?
+                select coalesce(sum(postings), 0) from daily_query_postings
+                where search_text = ? and day >= ? and day <= ?
             """,
-            (search_text,)
+            (search_text, since, until)
         )
-        row = cursor.fetchone()
-        if row is None:
-            return None
+        (postings,) = cursor.fetchone()
+    return {"searchText": search_text, "since": since, "until": until, "mode": mode, "postings": postings,
+            "skills": skills}
 
-        created_at = parse(row[2])
-        now = datetime.now(timezone.utc)
-        if (now - created_at).seconds > MAX_CACHE_AGE_SECONDS:
-            delete_cached_request(search_text)
-            return None
 
-        return {
-            "skills": row[0],
-            "imageUrl": row[1],
-            "createdAt": row[2]
-        }
+def get_skill_risers(search_text, days, top_k=None):
+    # Skills whose share of postings grew the most, the last `days` days against the `days` before them
+    since, until = trend_days(days)
+    previous_since, previous_until = trend_days(days, datetime.fromisoformat(since).date() - timedelta(days=1))
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            """
+                select
+                    sum(case when day >= ? then postings else 0 end),
+                    sum(case when day < ? then postings else 0 end)
+                from daily_query_postings where search_text = ? and day >= ? and day <= ?
+            """,
+            (since, since, search_text, previous_since, until)
+        )
+        current_postings, previous_postings = (count or 0 for count in cursor.fetchone())
+        cursor.execute(
+            """
+                select skill,
+                    sum(case when day >= ? then postings else 0 end) as current,
+                    sum(case when day < ? then postings else 0 end) as previous
+                from daily_skill_counts where search_text = ? and day >= ? and day <= ?
+                group by skill having current >= ?
+            """,
+            (since, since, search_text, previous_since, until, TREND_MIN_POSTINGS)
+        )
+        rows = cursor.fetchall()
+
+    risers = []
+    for skill, current, previous in rows:
+        current_share = current / current_postings if current_postings else 0.0
+        previous_share = previous / previous_postings if previous_postings else 0.0
+        risers.append({"name": skill, "currentPostings": current, "previousPostings": previous,
+                       "currentShare": round(current_share, 4), "previousShare": round(previous_share, 4),
+                       "change": round(current_share - previous_share, 4)})
+    risers.sort(key=lambda riser: (-riser["change"], riser["name"]))
+    return {
+        "searchText": search_text,
+        "current": {"since": since, "until": until, "postings": current_postings},
+        "previous": {"since": previous_since, "until": previous_until, "postings": previous_postings},
+        "risers": risers if top_k is None else risers[:top_k]
+    }
+
+
+def get_query_posting_counts(search_text):
+    # Token counts of every posting seen for the query within the search window, once per group of
+    # near-duplicates
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            """
+                select p.token_counts from query_postings q
+                join postings p on p.job_id = q.job_id
+                where q.search_text = ? and q.last_seen_at > ? and p.extraction = ?
+                group by coalesce(p.duplicate_of, p.job_id)
+            """,
+            (search_text, datetime.now(timezone.utc) - POSTING_WINDOW, extraction_version())
+        )
+        return [json.loads(row[0]) for row in cursor.fetchall()]
 
 
-def cache_request(search_text, skills, image_url):
+def get_query_job_ids(search_text):
+    # Ids of every posting seen for the query within the search window, near-duplicates under the id of
+    # the posting they copy
     with get_db_cursor() as cursor:
         cursor.execute(
             """
-                insert into cached_requests (search_text, skills, image_url, created_at) 
-                values (?, ?, ?, ?)
+                select distinct coalesce(p.duplicate_of, p.job_id) from query_postings q
+                join postings p on p.job_id = q.job_id
+                where q.search_text = ? and q.last_seen_at > ? and p.extraction = ?
             """,
-            (search_text, skills, image_url, datetime.now(timezone.utc))
+            (search_text, datetime.now(timezone.utc) - POSTING_WINDOW, extraction_version())
         )
-        connection.commit()
+        return [row[0] for row in cursor.fetchall()]
+
+
+def get_term_index():
+    # Created on first use: app.distinctiveness needs scipy, which count scoring never loads
+    global _term_index
+    if _term_index is None:
+        from app.distinctiveness import TermIndex
+        _term_index = TermIndex(os.path.join(BASE_DIRECTORY, 'term-index.npz'))
+    return _term_index
+
+
+def rank_query_skills(search_text):
+    # Raw counts of the query's postings, or how distinctive each term is for them against all stored postings
+    mode = check_scoring_mode(None)
+    if mode != 'count':
+        term_index = get_term_index()
+        term_index.sync(extraction_version())
+        ranked = term_index.score(get_query_job_ids(search_text), mode, check_count_mode(None))
+        if ranked:
+            return pandas.DataFrame(ranked, columns=['word', 'occurrences', 'score'])
+        # Nothing stands out, typically because the query's postings are the whole corpus (the first
+        # search on a new database): nothing to contrast them with, the counts are ranked instead
+    return merge_skill_counts(get_query_posting_counts(search_text))
+
+
+def posting_ids(job_data):
+    # SerpAPI job_id, falling back to a content hash for postings that come without one
+    descriptions = job_data.description.where(job_data.description.apply(lambda d: isinstance(d, str)), '')
+    if 'job_id' in job_data:
+        ids = job_data.job_id.where(job_data.job_id.apply(lambda j: isinstance(j, str) and j != ''), None)
+    else:
+        ids = pandas.Series([None] * len(job_data), index=job_data.index)
+    return [job_id or description_key(description) for job_id, description in zip(ids, descriptions)]
+
+
+def refresh_postings(job_title, timings=None, priority='interactive'):
+    # Fetch the current postings for the query and run the NLP only on the ones we have not seen before.
+    # Every page is fetched, so the postings still listed keep their last_seen_at within the window.
+    with time_stage('fetch', timings):
+        job_data = get_jobs(scheduler.plan_pages(SEARCH_PAGES, priority), job_title, priority=priority)
+
+    process_postings(job_title, job_data, timings, reprocess_outdated=True)
+
+
+def process_postings(job_title, job_data, timings=None, reprocess_outdated=False):
+    # Runs the NLP on the postings we have not seen before and records all of them for the query.
+    # Returns the ids of the postings in job_data and the token counts of the new ones.
+    seen_job_ids, new_counts = process_postings_many({job_title: job_data}, timings, reprocess_outdated)
+    return seen_job_ids[job_title], new_counts
+
+
+def process_postings_many(job_data_by_search, timings=None, reprocess_outdated=False):
+    # Same for several queries at once: postings they share are processed once, in a single NLP pass,
+    # and everything is saved in one transaction. With reprocess_outdated, the postings of the queries'
+    # windows processed under another extraction version are processed again from their stored
+    # description, without counting as seen on the result pages.
+    seen_job_ids = {search_text: posting_ids(job_data) for search_text, job_data in job_data_by_search.items()}
+    known = get_known_posting_ids(list({job_id for job_ids in seen_job_ids.values() for job_id in job_ids}))
+    new_frames = []
+    new_ids = []
+    for search_text, job_data in job_data_by_search.items():
+        new_rows = {}
+        for position, job_id in enumerate(seen_job_ids[search_text]):
+            if job_id not in known and job_id not in new_rows:
+                new_rows[job_id] = position
+        known.update(new_rows)
+        new_ids.extend(new_rows)
+        new_frames.append(job_data.iloc[list(new_rows.values())])
+    if reprocess_outdated:
+        outdated = {job_id: description for job_id, description in get_outdated_postings(list(job_data_by_search))
+                    if job_id not in known}
+        new_ids.extend(outdated)
+        new_frames.append(pandas.DataFrame({'job_id': list(outdated), 'description': list(outdated.values())}))
+
+    new_postings = []
+    if new_ids:
+        new_data = pandas.concat(new_frames, ignore_index=True)
+        with time_stage('clean', timings):
+            job_descriptions = list(clean_jobs(new_data))  # Clean the job description
+        with time_stage('dedupe', timings):
+            signatures, duplicates = detect_near_duplicates(new_ids, job_descriptions)
+            counts = get_posting_token_counts(list(set(duplicates.values()) - set(new_ids)))
+            # a stored original gone since the lookup (replaced by another extraction) leaves its copy unique
+            duplicates = {job_id: original for job_id, original in duplicates.items()
+                          if original in counts or original in signatures}
+        # Copies of a posting skip the NLP and take over its counts
+        unique = [position for position, job_id in enumerate(new_ids) if job_id not in duplicates]
+        with time_stage('lemmatize' if EXTRACTION_MODE == 'nlp' else 'match', timings):
+            clean_texts = extract_skills([job_descriptions[position] for position in unique], cache=lemma_cache)
+        counts.update(zip((new_ids[position] for position in unique), count_tokens(clean_texts)))
+        raw_descriptions = [description if isinstance(description, str) else ''
+                            for description in new_data['description']]
+        new_postings = [(job_id, description, counts[duplicates.get(job_id, job_id)], duplicates.get(job_id),
+                         signatures[job_id], raw_description)
+                        for job_id, description, raw_description in zip(new_ids, job_descriptions, raw_descriptions)]
+        if duplicates:
+            NEAR_DUPLICATES.inc(len(duplicates))
+
+    with time_stage('db_write', timings):
+        save_postings(new_postings, {search_text: set(job_ids) for search_text, job_ids in seen_job_ids.items()})
+    # counts of near-duplicates are reported under the posting they copy, so they are merged only once
+    return seen_job_ids, {duplicate_of or job_id: counts for job_id, _, counts, duplicate_of, _, _ in new_postings}
+
+
+def detect_near_duplicates(job_ids, job_descriptions):
+    # MinHash signatures of the new postings and {job_id: id of the posting it copies} for the ones
+    # that are near-duplicates of a stored posting or of another new one
+    signatures = {job_id: signature(description) for job_id, description in zip(job_ids, job_descriptions)}
+    if NEAR_DUPLICATE_THRESHOLD <= 0:
+        return signatures, {}
+    stored = get_bucket_candidates({bucket for job_signature in signatures.values() if job_signature is not None
+                                    for bucket in buckets(job_signature)})
+    return signatures, find_near_duplicates(signatures, NEAR_DUPLICATE_THRESHOLD, stored)
+
+
+# In-process LRU in front of cached_requests, so repeated hits skip SQLite and date parsing. It is
+# dropped when the cache generation in the database has moved on, which is read at most once every
+# CACHE_GENERATION_CHECK_SECONDS: entries deleted by another process stop being served within that time.
+result_cache = OrderedDict()
+result_cache_generation = None
+result_cache_checked_at = None
+search_stats = Counter()
+
+
+def remember_cached_request(search_text, entry):
+    result_cache[search_text] = entry
+    result_cache.move_to_end(search_text)
+    while len(result_cache) > RESULT_CACHE_MAX_ENTRIES:
+        result_cache.popitem(last=False)
+
+
+def sync_cache_generation():
+    global result_cache_generation, result_cache_checked_at
+    now = time.monotonic()
+    if result_cache_checked_at is not None and now - result_cache_checked_at < CACHE_GENERATION_CHECK_SECONDS:
+        return
+    result_cache_checked_at = now
+    with get_db_cursor() as cursor:
+        cursor.execute("select generation from cache_generation where id = 0")
+        row = cursor.fetchone()
+    generation = row[0] if row else 0
+    if generation != result_cache_generation:
+        result_cache.clear()
+        result_cache_generation = generation
 
 
-def delete_cached_request(search_text):
+def read_cached_request(search_text):
     with get_db_cursor() as cursor:
         cursor.execute(
             """
-                delete from cached_requests where search_text = ?
+                select skills, image_url, created_at, payload from cached_requests where search_text = ?
             """,
             (search_text,)
         )
-        connection.commit()
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    return {
+        "skills": row[0],
+        "imageUrl": row[1],
+        "createdAt": datetime.fromisoformat(row[2]),
+        "payload": (row[3] or skills_payload(row[0])).encode()  # entries cached before payloads existed
+    }
+
+
+def cached_request_age(entry):
+    return (datetime.now(timezone.utc) - entry["createdAt"]).total_seconds()
+
+
+def is_servable(entry, allow_stale):
+    age = cached_request_age(entry)
+    return age <= HARD_MAX_CACHE_AGE_SECONDS and (allow_stale or age <= MAX_CACHE_AGE_SECONDS)
+
+
+def get_cached_request(search_text, allow_stale=True):
+    sync_cache_generation()
+    tier = "memory"
+    entry = result_cache.get(search_text)
+    if entry is not None and not is_servable(entry, allow_stale):
+        # another process may have refreshed the entry since this one read it
+        result_cache.pop(search_text, None)
+        entry = None
+    if entry is None:
+        tier = "db"
+        entry = read_cached_request(search_text)
+        if entry is None or not is_servable(entry, allow_stale):
+            return None
+        remember_cached_request(search_text, entry)
+    else:
+        result_cache.move_to_end(search_text)
 
+    return dict(entry, tier=tier, stale=cached_request_age(entry) > MAX_CACHE_AGE_SECONDS)
 
-def save_request(request_id, search_text, skills, ip_address):
+
+def skills_payload(skills):
+    # The skills list of a search response (the Skill model) as compact JSON, from the column-oriented
+    # JSON of the ranking DataFrame, without going through pandas or pydantic
+    columns = json.loads(skills)
+    words, occurrences, scores = columns.get("word", {}), columns.get("occurrences", {}), columns.get("score")
+    return json.dumps([{"name": words[row], "occurrences": occurrences[row], "score": scores and scores[row]}
+                       for row in sorted(words, key=int)], separators=(',', ':'))
+
+
+def search_response_body(task_id, image_name, payload):
+    # A finished CreateSearchTaskResponse as bytes: only the uuid and the chart URL change between
+    # requests, they are spliced around the pre-serialized skills
+    return b''.join((b'{"uuid":"', task_id.encode(), b'","status":"done","imageUrl":',
+                     json.dumps(image_url(image_name)).encode(), b',"skills":', payload, b'}'))
+
+
+def cache_request(search_text, skills, image_name):
+    cache_requests([(search_text, skills, image_name)])
+
+
+def cache_requests(entries):
+    # entries: [(search_text, skills, image_name)], written in one transaction.
+    # An empty image name means the chart is rendered the first time the entry is served.
+    created_at = datetime.now(timezone.utc)
+    payloads = [skills_payload(skills) for _, skills, _ in entries]
     with get_db_cursor() as cursor:
-        cursor.execute(
+        cursor.executemany(
             """
-                insert into requests (requestId, search_text, skills, created_at, ip_address) 
+                insert or replace into cached_requests (search_text, skills, image_url, created_at, payload) 
                 values (?, ?, ?, ?, ?)
             """,
-            (request_id, search_text, skills, datetime.now(timezone.utc), ip_address)
+            [(search_text, skills, image_name, created_at, payload)
+             for (search_text, skills, image_name), payload in zip(entries, payloads)]
         )
-        connection.commit()
+        cursor.connection.commit()
+    for (search_text, skills, image_name), payload in zip(entries, payloads):
+        remember_cached_request(search_text, {"skills": skills, "imageUrl": image_name, "createdAt": created_at,
+                                              "payload": payload.encode()})
+
+
+def set_cached_image(search_text, image_name):
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            """
+                update cached_requests set image_url = ? where search_text = ?
+            """,
+            (image_name, search_text)
+        )
+        cursor.connection.commit()
+    entry = result_cache.get(search_text)
+    if entry is not None:
+        entry["imageUrl"] = image_name
+
+
+# Analytics rows are not needed to answer the request, they are inserted in batches off the request path
+request_log = WriteBehindWriter(
+    """
+        insert into requests (requestId, search_text, skills, created_at, ip_address) 
+        values (?, ?, ?, ?, ?)
+    """,
+    batch_size=REQUEST_LOG_BATCH_SIZE,
+    flush_interval=REQUEST_LOG_FLUSH_MS / 1000
+)
+
+
+def save_request(request_id, search_text, skills, ip_address):
+    request_log.add((request_id, search_text, skills, datetime.now(timezone.utc), ip_address))
 
 
 def save_feedback_record(feedback_id, message, search_text, ip_address):
@@ -166,7 +865,7 @@ def save_feedback_record(feedback_id, message, search_text, ip_address):
             """,
             (feedback_id, message, search_text, ip_address, datetime.now(timezone.utc))
         )
-        connection.commit()
+        cursor.connection.commit()
 
 
 def get_feedback_records():
@@ -219,30 +918,260 @@ def get_cached_requests():
         } for row in rows]
 
 
+# Admin exports | (column, key) pairs, pages are keyset ranges over the rowid so memory stays flat
+FEEDBACK_EXPORT_COLUMNS = [("id", "id"), ("message", "message"), ("search_text", "searchText"),
+                           ("created_at", "createdAt"), ("ip_address", "ipAddress")]
+REQUEST_EXPORT_COLUMNS = [("requestId", "requestId"), ("search_text", "searchText"), ("skills", "skills"),
+                          ("created_at", "createdAt"), ("ip_address", "ipAddress")]
+CACHE_EXPORT_COLUMNS = [("search_text", "searchText"), ("skills", "skills"), ("image_url", "imageUrl"),
+                        ("created_at", "createdAt")]
+EXPORT_FORMATS = ('json', 'ndjson')
+
+
+def export_query(table, columns, since, limit):
+    query = f"select rowid, {', '.join(column for column, _ in columns)} from {table} where rowid > ? order by rowid"
+    params = [since or 0]
+    if limit is not None:
+        query += " limit ?"
+        params.append(limit)
+    return query, params
+
+
+def export_row(columns, row):
+    item = {"cursor": row[0]}
+    item.update((key, value) for (_, key), value in zip(columns, row[1:]))
+    return item
+
+
+def get_export_page(table, columns, since, limit):
+    limit = limit or EXPORT_PAGE_SIZE
+    with get_db_cursor() as cursor:
+        cursor.execute(*export_query(table, columns, since, limit))
+        items = [export_row(columns, row) for row in cursor.fetchall()]
+    return {
+        "items": items,
+        "nextCursor": items[-1]["cursor"] if len(items) == limit else None
+    }
+
+
+def stream_export(table, columns, since, limit):
+    # Starlette pulls the chunks from different threadpool threads, so the stream owns its connection
+    connection = open_connection(check_same_thread=False)
+    try:
+        cursor = connection.execute(*export_query(table, columns, since, limit))
+        while True:
+            rows = cursor.fetchmany(EXPORT_FETCH_SIZE)
+            if not rows:
+                break
+            yield ''.join(json.dumps(export_row(columns, row)) + '\n' for row in rows)
+    finally:
+        connection.close()
+
+
+def export_response(table, columns, since, limit, format, include_skills):
+    if format not in EXPORT_FORMATS:
+        return JSONResponse(status_code=400, content={"error": f"Unknown format, expected one of {EXPORT_FORMATS}"})
+    if limit is not None and not 1 <= limit <= EXPORT_MAX_PAGE_SIZE:
+        # SQLite reads a negative limit as no limit at all
+        return JSONResponse(status_code=400,
+                            content={"error": f"limit must be between 1 and {EXPORT_MAX_PAGE_SIZE}"})
+
+    if not include_skills:
+        columns = [(column, key) for column, key in columns if column != "skills"]
+
+    if format == "ndjson":
+        return StreamingResponse(stream_export(table, columns, since, limit), media_type="application/x-ndjson")
+
+    return get_export_page(table, columns, since, limit)
+
+
+def get_cache_stats():
+    # Hit rates of this server process, per cache tier
+    lookups = search_stats["cache_memory_hits"] + search_stats["cache_db_hits"] + search_stats["cache_misses"]
+    return {
+        "lookups": lookups,
+        "memoryHits": search_stats["cache_memory_hits"],
+        "dbHits": search_stats["cache_db_hits"],
+        "misses": search_stats["cache_misses"],
+        "staleHits": search_stats["cache_stale_hits"],
+        "backgroundRefreshes": search_stats["cache_refreshes"],
+        "memoryHitRate": search_stats["cache_memory_hits"] / lookups if lookups else 0.0,
+        "dbHitRate": search_stats["cache_db_hits"] / lookups if lookups else 0.0,
+        "memoryEntries": len(result_cache)
+    }
+
+
+def create_search_task_record(task_id, search_text):
+    now = datetime.now(timezone.utc)
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            """
+                insert into search_tasks (id, search_text, status, created_at, updated_at) 
+                values (?, ?, 'pending', ?, ?)
+            """,
+            (task_id, search_text, now, now)
+        )
+        cursor.connection.commit()
+
+
+def update_search_task_record(task_id, status, result=None, error=None):
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            """
+                update search_tasks set status = ?, result = ?, error = ?, updated_at = ? where id = ?
+            """,
+            (status, result, error, datetime.now(timezone.utc), task_id)
+        )
+        cursor.connection.commit()
+
+
+def get_search_task_record(task_id):
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            """
+                select id, search_text, status, result, error, created_at from search_tasks where id = ?
+            """,
+            (task_id,)
+        )
+        row = cursor.fetchone()
+        if row is None:
+            return None
+
+        return {
+            "uuid": row[0],
+            "searchText": row[1],
+            "status": row[2],
+            "result": row[3],
+            "error": row[4],
+            "createdAt": row[5]
+        }
+
+
+def acquire_search_lease(search_text, owner):
+    # Only one server process computes a given search at a time, the lease expires if its owner dies
+    now = datetime.now(timezone.utc)
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            """
+                delete from search_leases where search_text = ? and expires_at < ?
+            """,
+            (search_text, now)
+        )
+        cursor.execute(
+            """
+                insert or ignore into search_leases (search_text, owner, expires_at) 
+                values (?, ?, ?)
+            """,
+            (search_text, owner, now + timedelta(seconds=SEARCH_LEASE_SECONDS))
+        )
+        acquired = cursor.rowcount == 1
+        cursor.connection.commit()
+        return acquired
+
+
+def release_search_lease(search_text, owner):
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            """
+                delete from search_leases where search_text = ? and owner = ?
+            """,
+            (search_text, owner)
+        )
+        cursor.connection.commit()
+
+
 def delete_all_cached_requests():
+    global result_cache_checked_at
     with get_db_cursor() as cursor:
         cursor.execute(
             """
                 delete from cached_requests
             """
         )
-        connection.commit()
+        cursor.execute("update cache_generation set generation = generation + 1 where id = 0")
+        cursor.connection.commit()
+    result_cache.clear()
+    result_cache_checked_at = None  # the next lookup picks up the new generation
+
+
+def store_image(image):
+    # Charts are written once under the hash of their bytes and shared by every response that shows them
+    image_name = f"charts/{hashlib.sha256(image).hexdigest()}.{CHART_FORMAT}"
+    path = os.path.join(STATIC_DIRECTORY, image_name)
+    try:
+        # a chart already stored gets a new mtime, so collect_unreferenced_images keeps it for the grace
+        # period even when no cache entry points at it yet
+        os.utime(path)
+    except FileNotFoundError:
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(image)
+        os.replace(tmp_path, path)
+    return image_name
+
 
+def image_url(image_name):
+    # Older cache entries hold the absolute path of a copied file in the static directory
+    if os.path.isabs(image_name):
+        image_name = os.path.relpath(image_name, STATIC_DIRECTORY)
+    return f"{DOMAIN}/static/{image_name}"
 
-def clone_file(src, dst):
-    with open(src, 'rb') as file_src:
-        with open(dst, 'wb') as file_dst:
-            file_dst.write(file_src.read())
+
+def get_referenced_images():
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            """
+                select image_url from cached_requests where image_url != ''
+            """
+        )
+        return {os.path.relpath(row[0], STATIC_DIRECTORY) if os.path.isabs(row[0]) else row[0]
+                for row in cursor.fetchall()}
+
+
+def collect_unreferenced_images():
+    # Removes charts no cache entry points at, plus the per-request copies older versions left behind.
+    # Files younger than the grace period are kept, they may belong to a search that is still finishing.
+    referenced = get_referenced_images()
+    cutoff = datetime.now().timestamp() - IMAGE_GC_GRACE_SECONDS
+    candidates = [os.path.join('charts', name) for name in os.listdir(CHART_DIRECTORY)]
+    candidates += [name for name in os.listdir(STATIC_DIRECTORY) if LEGACY_IMAGE_PATTERN.match(name)]
+
+    removed_files = 0
+    reclaimed_bytes = 0
+    for image_name in candidates:
+        if image_name in referenced:
+            continue
+        path = os.path.join(STATIC_DIRECTORY, image_name)
+        try:
+            stat = os.stat(path)
+            if stat.st_mtime > cutoff:
+                continue
+            os.remove(path)
+        except FileNotFoundError:
+            continue
+        removed_files += 1
+        reclaimed_bytes += stat.st_size
+
+    return {"removedFiles": removed_files, "reclaimedBytes": reclaimed_bytes}
+
+
+class CachedStaticFiles(StaticFiles):
+    # Content-addressed charts never change, so browsers and proxies may keep them for good
+    async def get_response(self, path, scope):
+        response = await super().get_response(path, scope)
+        if response.status_code == 200 and path.startswith('charts/'):
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
 
 
 # Middleware Setup
-limiter = Limiter(key_func=get_remote_address)
+limiter = Limiter(key_func=get_remote_address, storage_uri=RATE_LIMIT_STORAGE)
 app = FastAPI()
 
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
-app.mount("/static", StaticFiles(directory=STATIC_DIRECTORY), name="static")
+app.mount("/static", CachedStaticFiles(directory=STATIC_DIRECTORY), name="static")
 
 origins = [
     "https://job-keywords.khremin.com",
@@ -257,6 +1186,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+startup_timings["import app.main"] = time.perf_counter() - IMPORT_STARTED
+warmed_up = threading.Event()
+warm_up_finished = threading.Event()
+warm_up_thread = None
+
+
+def run_warm_up():
+    try:
+        warm_up()
+        warmed_up.set()
+        print("Startup timings: " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in startup_timings.items()))
+    except Exception as e:
+        print(f"Warm-up failed: {e!r}")
+    finally:
+        warm_up_finished.set()
+
+
+def reset_after_fork():
+    # Called in every app.prefork worker. In-memory rate limits start empty and without locks held
+    # by the parent, shared storages are left alone.
+    if RATE_LIMIT_STORAGE.startswith('memory://'):
+        limiter.reset()
+
+
+@app.on_event("startup")
+def start_warm_up():
+    global warm_up_thread
+    metrics.mark_owner()
+    # The model and plotting libraries load in the background, /healthz/ready reports when they are done
+    warm_up_thread = threading.Thread(target=run_warm_up, name="warm-up", daemon=True)
+    warm_up_thread.start()
+
 
 # Models
 class CreateSearchTaskRequest(BaseModel):
@@ -266,14 +1227,36 @@ class CreateSearchTaskRequest(BaseModel):
 class Skill(BaseModel):
     name: str
     occurrences: int
+    score: Optional[float] = None  # distinctiveness, with JK_SKILL_SCORING=tfidf or logodds
 
 
 class CreateSearchTaskResponse(BaseModel):
     uuid: str
+    status: str = "done"
     imageUrl: str
     skills: List[Skill]
 
 
+class BatchSearchRequest(BaseModel):
+    searchTokens: List[str]
+    locations: List[str] = []  # every title is searched in every location, the default location when empty
+    refresh: bool = False  # recompute entries that are still fresh in the cache
+
+
+class BatchSearchResult(BaseModel):
+    searchText: str
+    searchToken: str
+    location: str
+    status: str  # "done", "cached" or "failed"
+    imageUrl: Optional[str] = None
+    skills: List[Skill] = []
+    error: Optional[str] = None
+
+
+class BatchSearchResponse(BaseModel):
+    results: List[BatchSearchResult]
+
+
 class CreateFeedbackRequest(BaseModel):
     message: str
     searchText: str
@@ -284,7 +1267,8 @@ class CreateFeedbackResponse(BaseModel):
 
 
 def transform_skills(skills):
-    return [Skill(name=skill['word'], occurrences=skill['occurrences']) for skill in skills.to_dict('records')]
+    return [Skill(name=skill['word'], occurrences=skill['occurrences'], score=skill.get('score'))
+            for skill in skills.to_dict('records')]
 
 
 def get_real_client_ip(request: Request):
@@ -300,52 +1284,539 @@ async def root(request: Request):
     return RedirectResponse(url="/static/index.html")
 
 
+@app.get("/metrics")
+async def get_metrics():
+    return Response(content=render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/healthz/ready")
+async def readiness():
+    timings = {name: round(seconds, 3) for name, seconds in startup_timings.items()}
+    if not warmed_up.is_set():
+        return JSONResponse(status_code=503, content={"status": "warming up", "startupTimings": timings})
+
+    return {"status": "ready", "extractionMode": EXTRACTION_MODE, "startupTimings": timings}
+
+
+def run_search(job_title, priority='interactive'):
+    # Runs in a search worker process: fetch, NLP, counting and the chart. Returns the skills as JSON,
+    # the name of the stored chart, the per-stage timings and the metric observations made in the worker
+    timings = {}
+    refresh_postings(job_title, timings, priority)  # Get the jobs and process the new ones
+    return finish_search(job_title, timings)
+
+
+def run_search_page(job_title, start):
+    # Runs in a search worker process for streamed searches: fetch and process a single result page.
+    # Returns the token counts of its postings, the per-stage timings and the metric observations.
+    timings = {}
+    with time_stage('fetch', timings):
+        job_data = get_jobs([start], job_title)
+    job_ids, posting_counts = process_postings(job_title, job_data, timings)
+    posting_counts.update(get_posting_token_counts([job_id for job_id in job_ids if job_id not in posting_counts]))
+    return posting_counts, timings, metrics.drain()
+
+
+def finish_search(job_title, timings=None):
+    # Ranks every posting seen for the query within the search window and renders the chart
+    timings = {} if timings is None else timings
+    with time_stage('count', timings):
+        skills = rank_query_skills(job_title)  # Aggregates the words
+
+    with time_stage('render', timings):
+        image_name = store_image(render_chart(skills))  # Visualizes the text and creates a URL
+
+    return skills.to_json(), image_name, timings, metrics.drain()
+
+
+def batch_search_text(job_title, location=None):
+    # Cache key of a batch search, searches in the default location share the interactive entries
+    if not location or location == DEFAULT_LOCATION:
+        return job_title
+    return f"{job_title} | {location}"
+
+
+def run_batch_search(searches):
+    # Runs in a search worker process: fetches the pages of every (job_title, location) search together,
+    # runs the NLP once over the postings none of them had before and ranks each search.
+    # Charts are left out, they are rendered when an entry is first served.
+    timings = {}
+    pages = scheduler.plan_pages(SEARCH_PAGES, 'batch', len(searches))
+    with time_stage('fetch', timings):
+        job_data, failed = get_jobs_many(searches, pages, 'batch')
+    searches = [search for search in searches if search not in failed]
+    process_postings_many({batch_search_text(*search): job_data[search] for search in searches}, timings,
+                          reprocess_outdated=True)
+
+    results = {}
+    with time_stage('count', timings):
+        for search in searches:
+            search_text = batch_search_text(*search)
+            results[search_text] = rank_query_skills(search_text).to_json()
+    failures = {batch_search_text(*search): f"Every SerpAPI page for '{search[0]}' failed" for search in failed}
+    return results, failures, timings, metrics.drain()
+
+
+def run_chart_render(skills_json):
+    # Runs in a search worker process, for cache entries written without a chart
+    with time_stage('render'):
+        image_name = store_image(render_chart(pandas.DataFrame(json.loads(skills_json))))
+    return image_name, metrics.drain()
+
+
+_search_executor = None
+pending_searches = {}
+inflight_searches = {}
+refresh_searches = set()
+
+Gauge('jk_searches_in_flight', 'Distinct searches being computed by this server process',
+      function=lambda: len(inflight_searches))
+Gauge('jk_search_tasks_pending', 'Search tasks waiting for a result in this server process',
+      function=lambda: len(pending_searches))
+
+
+def get_search_executor():
+    # Created on first use so the workers are forked from a fully imported server process
+    global _search_executor
+    if _search_executor is None:
+        _search_executor = ProcessPoolExecutor(max_workers=SEARCH_WORKERS)
+    return _search_executor
+
+
+async def submit_search(func, *args):
+    # The pool forks its workers on the first submit. Forking while the warm-up thread is halfway
+    # through an import leaves the import locks held in the children, so wait for it to finish.
+    if warm_up_thread is not None and not warm_up_finished.is_set():
+        await asyncio.get_running_loop().run_in_executor(None, warm_up_finished.wait)
+    executor = get_search_executor()
+    try:
+        future = executor.submit(func, *args)
+    except BrokenProcessPool:
+        # a worker died after the last search finished, this one goes to a new pool
+        discard_search_executor(executor)
+        executor = get_search_executor()
+        future = executor.submit(func, *args)
+    try:
+        return await asyncio.wrap_future(future)
+    except BrokenProcessPool:
+        # A worker died (killed for memory in the middle of the NLP, say). The searches running in the
+        # pool fail, the next ones get a new pool.
+        discard_search_executor(executor)
+        raise
+
+
+def discard_search_executor(executor):
+    global _search_executor
+    if _search_executor is executor:
+        _search_executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+        print("Search process pool broken by a dead worker, starting a new one")
+
+
+async def compute_search(job_title, progress=None, priority='interactive'):
+    # Single-flight per search text: concurrent callers in this process share one computation,
+    # and a lease row makes callers in other server processes wait for the cached result instead.
+    # `progress` receives the partial rankings, only when this call ends up running the search.
+    # `priority` orders the SerpAPI calls, see app.scheduler.
+    inflight = inflight_searches.get(job_title)
+    if inflight is not None:
+        search_stats["coalesced"] += 1
+        COALESCED_SEARCHES.inc(scope="process")
+        return await asyncio.shield(inflight)
+
+    inflight = asyncio.ensure_future(compute_search_once(job_title, progress, priority))
+    inflight_searches[job_title] = inflight
+    inflight.add_done_callback(lambda _: inflight_searches.pop(job_title, None))
+    return await asyncio.shield(inflight)
+
+
+async def compute_search_once(job_title, progress=None, priority='interactive'):
+    owner = str(uuid.uuid4())
+    while True:
+        if acquire_search_lease(job_title, owner):
+            try:
+                # another process may have finished the search while we were waiting for the lease
+                cached_request = get_cached_request(job_title, allow_stale=False)
+                if cached_request is not None:
+                    search_stats["coalesced_across_workers"] += 1
+                    COALESCED_SEARCHES.inc(scope="workers")
+                    return cached_request["skills"], await ensure_cached_chart(job_title, cached_request), {}
+
+                if progress is None:
+                    skills_json, image_name, timings, observations = await submit_search(run_search, job_title, priority)
+                    metrics.replay(observations)
+                else:
+                    skills_json, image_name, timings = await run_search_progressively(job_title, progress)
+
+                # cache the request
+                with time_stage('db_write', timings):
+                    cache_request(job_title, skills_json, image_name)
+                return skills_json, image_name, timings
+            finally:
+                release_search_lease(job_title, owner)
+
+        await asyncio.sleep(SEARCH_LEASE_POLL_SECONDS)
+        cached_request = get_cached_request(job_title, allow_stale=False)
+        if cached_request is not None:
+            search_stats["coalesced_across_workers"] += 1
+            COALESCED_SEARCHES.inc(scope="workers")
+            return cached_request["skills"], await ensure_cached_chart(job_title, cached_request), {}
+
+
+async def run_search_progressively(job_title, progress):
+    # The result pages are fetched and processed in parallel, and the ranking merged so far is reported
+    # as each one comes in. The final ranking and the chart cover every posting seen within the search
+    # window, so they can include postings from earlier searches that are no longer on these pages.
+    timings = {}
+    combined = Counter()
+    seen = set()
+    failed = 0
+    pages = [submit_search(run_search_page, job_title, start) for start in scheduler.plan_pages(SEARCH_PAGES)]
+    for pages_done, page in enumerate(asyncio.as_completed(pages), 1):
+        # a failed page leaves the others running, the search fails only when none of them comes through
+        try:
+            posting_counts, page_timings, observations = await page
+        except Exception as e:
+            print(f"Result page of streamed search '{job_title}' failed: {e!r}")
+            failed += 1
+            if failed == len(pages):
+                raise
+            continue
+        metrics.replay(observations)
+        for stage, seconds in page_timings.items():
+            timings[stage] = timings.get(stage, 0.0) + seconds
+
+        add_skill_counts(combined, [counts for job_id, counts in posting_counts.items() if job_id not in seen])
+        seen.update(posting_counts)
+        progress({
+            "pagesDone": pages_done,
+            "pages": len(pages),
+            "postings": len(seen),
+            "skills": [skill.dict() for skill in transform_skills(rank_skills(combined, STREAM_TOP_K))]
+        })
+
+    skills_json, image_name, timings, observations = await submit_search(finish_search, job_title, timings)
+    metrics.replay(observations)
+    return skills_json, image_name, timings
+
+
+def refresh_in_background(job_title):
+    # Stale cache entries are served right away and recomputed once behind the scenes
+    if job_title in inflight_searches:
+        return
+
+    refresh = asyncio.create_task(compute_search(job_title, priority='refresh'))
+    refresh_searches.add(refresh)
+    search_stats["cache_refreshes"] += 1
+
+    def refresh_done(task):
+        refresh_searches.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Background refresh for '{job_title}' failed: {task.exception()!r}")
+
+    refresh.add_done_callback(refresh_done)
+
+
+def log_search_timings(task_id, job_title, cache, timings, started):
+    # One structured line per search, so slow requests can be traced to a stage
+    print(json.dumps({
+        "event": "search",
+        "taskId": task_id,
+        "searchText": job_title,
+        "cache": cache,
+        "stagesMs": {stage: round(seconds * 1000, 2) for stage, seconds in timings.items()},
+        "totalMs": round((time.perf_counter() - started) * 1000, 2)
+    }))
+
+
+async def complete_search_task(task_id, job_title, client_ip_address, started, updates=None):
+    # `updates` is a queue for streamed searches, it receives (status, JSON) for every partial ranking
+    # and for the final result
+    def send(status, payload):
+        if updates is not None:
+            updates.put_nowait((status, payload))
+
+    def send_partial(update):
+        send("partial", json.dumps({"uuid": task_id, "status": "partial", **update}))
+
+    try:
+        skills_json, image_name, timings = await compute_search(job_title, None if updates is None else send_partial)
+
+        save_request(task_id, job_title, skills_json, client_ip_address)
+
+        result = search_response_body(task_id, image_name, skills_payload(skills_json).encode()).decode()
+        with time_stage('db_write', timings):
+            update_search_task_record(task_id, "done", result=result)
+        log_search_timings(task_id, job_title, "miss", timings, started)
+        send("done", result)
+    except Exception as e:
+        print(f"Search task {task_id} for '{job_title}' failed: {e!r}")
+        update_search_task_record(task_id, "failed", error=str(e))
+        send("failed", json.dumps({"uuid": task_id, "status": "failed", "error": str(e)}))
+    finally:
+        pending_searches.pop(task_id, None)
+
+
+def find_cached_search(job_title, timings):
+    # Cache lookup with its accounting, stale entries are served and refreshed in the background
+    with time_stage('cache_lookup', timings):
+        cached_request = get_cached_request(job_title)
+    if cached_request is None:
+        search_stats["cache_misses"] += 1
+        CACHE_LOOKUPS.inc(result="miss")
+        return None
+
+    search_stats[f"cache_{cached_request['tier']}_hits"] += 1
+    CACHE_LOOKUPS.inc(result=f"{cached_request['tier']}_hit")
+    if cached_request["stale"]:
+        search_stats["cache_stale_hits"] += 1
+        CACHE_LOOKUPS.inc(result="stale")
+        refresh_in_background(job_title)
+    return cached_request
+
+
+async def ensure_cached_chart(search_text, cached_request, timings=None):
+    # Batch searches cache their results without a chart, it is rendered the first time one is served
+    if cached_request["imageUrl"]:
+        return cached_request["imageUrl"]
+
+    started = time.perf_counter()
+    image_name, observations = await submit_search(run_chart_render, cached_request["skills"])
+    metrics.replay(observations)
+    set_cached_image(search_text, image_name)
+    if timings is not None:
+        timings["render"] = time.perf_counter() - started
+    return image_name
+
+
+async def cached_search_response(task_id, job_title, cached_request, client_ip_address, timings, started):
+    # Response body of a cache hit, as bytes ready to send
+    save_request(task_id, job_title, cached_request["skills"], client_ip_address)
+
+    image_name = await ensure_cached_chart(job_title, cached_request, timings)
+    body = search_response_body(task_id, image_name, cached_request["payload"])
+    log_search_timings(task_id, job_title, cached_request["tier"], timings, started)
+    return body
+
+
+def stream_message(status, payload, format):
+    # Server-Sent Events are named after the status, NDJSON sends one object per line
+    if format == "sse":
+        return f"event: {status}\ndata: {payload}\n\n"
+    return payload + "\n"
+
+
+async def stream_search_updates(updates, format):
+    while True:
+        status, payload = await updates.get()
+        yield stream_message(status, payload, format)
+        if status != "partial":
+            break
+
+
 @app.post("/search/tasks")
 @limiter.limit("5/second")
 async def create_search_task(body: CreateSearchTaskRequest, request: Request):
+    started = time.perf_counter()
     task_id = str(uuid.uuid4())
     client_ip_address = get_real_client_ip(request)
 
     job_title = str.strip(body.searchToken)
 
-    # Set the name you want to give the image in Google Cloud Storage
-    gcs_file_name = os.path.join(STATIC_DIRECTORY, f"{task_id}.png")
-
     # check if we have a cached request
-    cached_request = get_cached_request(job_title)
+    timings = {}
+    cached_request = find_cached_search(job_title, timings)
     if cached_request is not None:
-        save_request(task_id, job_title, cached_request["skills"], client_ip_address)
+        body = await cached_search_response(task_id, job_title, cached_request, client_ip_address, timings, started)
+        return Response(content=body, media_type="application/json")
+
+    if len(pending_searches) >= MAX_QUEUED_SEARCHES:
+        return JSONResponse(status_code=429, content={"error": "Too many searches in progress, try again shortly"})
+
+    create_search_task_record(task_id, job_title)
+    pending_searches[task_id] = asyncio.create_task(complete_search_task(task_id, job_title, client_ip_address, started))
+
+    return JSONResponse(status_code=202, content={"uuid": task_id, "status": "pending"})
+
+
+@app.get("/search/stream")
+@limiter.limit("5/second")
+async def stream_search(request: Request, searchToken: str, format: str = "sse"):
+    # Streaming variant of POST /search/tasks: partial rankings as each result page is processed,
+    # then the final result with the chart. The task can also be polled under the same uuid.
+    if format not in STREAM_MEDIA_TYPES:
+        return JSONResponse(status_code=400,
+                            content={"error": f"Unknown format, expected one of {list(STREAM_MEDIA_TYPES)}"})
+
+    started = time.perf_counter()
+    task_id = str(uuid.uuid4())
+    client_ip_address = get_real_client_ip(request)
+
+    job_title = str.strip(searchToken)
+
+    updates = asyncio.Queue()
+    timings = {}
+    cached_request = find_cached_search(job_title, timings)
+    if cached_request is not None:
+        body = await cached_search_response(task_id, job_title, cached_request, client_ip_address, timings, started)
+        updates.put_nowait(("done", body.decode()))
+    elif len(pending_searches) >= MAX_QUEUED_SEARCHES:
+        return JSONResponse(status_code=429, content={"error": "Too many searches in progress, try again shortly"})
+    else:
+        create_search_task_record(task_id, job_title)
+        pending_searches[task_id] = asyncio.create_task(
+            complete_search_task(task_id, job_title, client_ip_address, started, updates))
+
+    return StreamingResponse(stream_search_updates(updates, format), media_type=STREAM_MEDIA_TYPES[format],
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+async def run_batch(searches, refresh=False):
+    # Returns {search_text: (status, skills_json, image_name, error)} for (job_title, location) searches
+    results = {}
+    todo = []
+    for job_title, location in searches:
+        search_text = batch_search_text(job_title, location)
+        cached_request = None if refresh else get_cached_request(search_text, allow_stale=False)
+        if cached_request is not None:
+            results[search_text] = ("cached", cached_request["skills"], cached_request["imageUrl"], None)
+        else:
+            todo.append((job_title, location))
+
+    if todo:
+        started = time.perf_counter()
+        try:
+            computed, failures, timings, observations = await submit_search(run_batch_search, todo)
+        except Exception as e:
+            print(f"Batch of {len(todo)} searches failed: {e!r}")
+            results.update((batch_search_text(*search), ("failed", None, None, str(e))) for search in todo)
+            return results
+        metrics.replay(observations)
+
+        with time_stage('db_write', timings):
+            cache_requests([(search_text, skills_json, '') for search_text, skills_json in computed.items()])
+        results.update((search_text, ("done", skills_json, '', None)) for search_text, skills_json in computed.items())
+        results.update((search_text, ("failed", None, None, error)) for search_text, error in failures.items())
+        print(json.dumps({
+            "event": "batch",
+            "searches": len(todo),
+            "stagesMs": {stage: round(seconds * 1000, 2) for stage, seconds in timings.items()},
+            "totalMs": round((time.perf_counter() - started) * 1000, 2)
+        }))
+    return results
+
+
+@app.post("/search/batch")
+@limiter.limit("5/second")
+async def batch_search(body: BatchSearchRequest, request: Request):
+    # Nightly reports: many titles in one call, sharing the fetch and the NLP work
+    if AUTH_TOKEN is None:
+        return {"error": "Authentication token is not set"}
 
-        clone_file(cached_request["imageUrl"], gcs_file_name)
+    auth = request.headers.get("Authorization")
+    if auth != ("Bearer " + AUTH_TOKEN):
+        return {"error": "Invalid authentication token"}
+
+    job_titles = list(dict.fromkeys(title.strip() for title in body.searchTokens if title.strip()))
+    locations = list(dict.fromkeys(location.strip() for location in body.locations if location.strip())) or [None]
+    searches = [(job_title, location) for job_title in job_titles for location in locations]
+    if len(searches) > MAX_BATCH_SEARCHES:
+        return JSONResponse(status_code=400,
+                            content={"error": f"Too many searches, at most {MAX_BATCH_SEARCHES} per batch"})
+
+    results = await run_batch(searches, body.refresh)
+
+    response = []
+    for job_title, location in searches:
+        search_text = batch_search_text(job_title, location)
+        status, skills_json, image_name, error = results[search_text]
+        response.append(BatchSearchResult(
+            searchText=search_text,
+            searchToken=job_title,
+            location=location or DEFAULT_LOCATION,
+            status=status,
+            imageUrl=image_url(image_name) if image_name else None,
+            skills=transform_skills(pandas.DataFrame(json.loads(skills_json))) if skills_json else [],
+            error=error
+        ))
+    return BatchSearchResponse(results=response)
+
+
+@app.get("/skills/trend")
+@limiter.limit("5/second")
+async def skill_trend(request: Request, searchToken: str, days: int = 30, top: int = 15, mode: Optional[str] = None):
+    # Answered from the daily rollups, no search is run
+    if not 1 <= days <= TREND_MAX_DAYS:
+        return JSONResponse(status_code=400, content={"error": f"days must be between 1 and {TREND_MAX_DAYS}"})
+    if mode is not None and mode not in COUNT_LABELS:
+        return JSONResponse(status_code=400, content={"error": f"Unknown mode, expected one of {list(COUNT_LABELS)}"})
+    if not 1 <= top <= TREND_MAX_TOP:
+        # SQLite reads a negative limit as no limit at all
+        return JSONResponse(status_code=400, content={"error": f"top must be between 1 and {TREND_MAX_TOP}"})
+
+    return get_skill_trend(str.strip(searchToken), days, top, mode)
 
-        return CreateSearchTaskResponse(uuid=task_id, imageUrl=f"{DOMAIN}/static/{task_id}.png",
-                                        skills=transform_skills(pandas.DataFrame(json.loads(cached_request["skills"]))))
 
-    # Set your Google Cloud Storage project ID
-    project_id = "job-selector"
+@app.get("/skills/risers")
+@limiter.limit("5/second")
+async def skill_risers(request: Request, searchToken: str, days: int = 7, top: int = 15):
+    if not 1 <= days <= TREND_MAX_DAYS // 2:
+        return JSONResponse(status_code=400, content={"error": f"days must be between 1 and {TREND_MAX_DAYS // 2}"})
+    if not 1 <= top <= TREND_MAX_TOP:
+        return JSONResponse(status_code=400, content={"error": f"top must be between 1 and {TREND_MAX_TOP}"})
+
+    return get_skill_risers(str.strip(searchToken), days, top)
+
+
+@app.get("/search/tasks/{task_id}")
+@limiter.limit("5/second")
+async def get_search_task(task_id: str, request: Request):
+    task = get_search_task_record(task_id)
+    if task is None:
+        return JSONResponse(status_code=404, content={"error": "Search task not found"})
 
-    # Set the name of the bucket where you want to upload the image
-    bucket_name = "job_images_bucket"
+    if task["status"] == "done":
+        return Response(content=task["result"], media_type="application/json")
 
-    # Get the skills
-    job_data = get_jobs([0, 10, 20, 30], job_title)  # Get the jobs
-    job_descriptions = clean_jobs(job_data)  # Clean the job description
-    clean_texts = text_process(job_descriptions)  # Clean the job description text
-    skills = find_skills(clean_texts)  # Aggregates the words
-    visualize(skills, project_id, bucket_name, gcs_file_name)  # Visualizes the text and creates a URL
+    return {"uuid": task["uuid"], "status": task["status"], "error": task["error"]}
+
+
+@app.on_event("shutdown")
+def shutdown_background_work():
+    if _search_executor is not None:
+        _search_executor.shutdown(wait=False, cancel_futures=True)
+    request_log.close()
+
+
+@app.get("/search/stats")
+@limiter.limit("5/second")
+async def get_search_stats(request: Request):
+    if AUTH_TOKEN is None:
+        return {"error": "Authentication token is not set"}
+
+    auth = request.headers.get("Authorization")
+    if auth != ("Bearer " + AUTH_TOKEN):
+        return {"error": "Invalid authentication token"}
 
-    skill_list: List[Skill] = transform_skills(skills)
+    return {
+        "pending": len(pending_searches),
+        "inflight": len(inflight_searches),
+        "coalesced": search_stats["coalesced"],
+        "coalescedAcrossWorkers": search_stats["coalesced_across_workers"]
+    }
 
-    cached_file_name = os.path.join(STATIC_DIRECTORY, f"cached_{task_id}.png")
 
-    # cache the request
-    cache_request(job_title, skills.to_json(), cached_file_name)
-    clone_file(gcs_file_name, cached_file_name)
+@app.get("/serpapi/budget")
+@limiter.limit("5/second")
+async def get_serpapi_budget(request: Request):
+    if AUTH_TOKEN is None:
+        return {"error": "Authentication token is not set"}
 
-    save_request(task_id, job_title, skills.to_json(), client_ip_address)
+    auth = request.headers.get("Authorization")
+    if auth != ("Bearer " + AUTH_TOKEN):
+        return {"error": "Invalid authentication token"}
 
-    return CreateSearchTaskResponse(uuid=task_id, imageUrl=f"{DOMAIN}/static/{task_id}.png",
-                                    skills=skill_list)
+    return scheduler.get_budget_status()
 
 
 @app.post("/feedback")
@@ -361,7 +1832,8 @@ async def create_feedback(body: CreateFeedbackRequest, request: Request):
 
 @app.get("/feedback/all")
 @limiter.limit("5/second")
-async def get_feedback(request: Request):
+async def get_feedback(request: Request, since: Optional[int] = None, limit: Optional[int] = None,
+                       format: str = "json"):
     if AUTH_TOKEN is None:
         return {"error": "Authentication token is not set"}
 
@@ -369,12 +1841,16 @@ async def get_feedback(request: Request):
     if auth != ("Bearer " + AUTH_TOKEN):
         return {"error": "Invalid authentication token"}
 
+    if since is not None or limit is not None or format != "json":
+        return export_response("feedback_records", FEEDBACK_EXPORT_COLUMNS, since, limit, format, True)
+
     return get_feedback_records()
 
 
 @app.get("/requests/all")
 @limiter.limit("5/second")
-async def get_request(request: Request):
+async def get_request(request: Request, since: Optional[int] = None, limit: Optional[int] = None,
+                      format: str = "json", include_skills: bool = True):
     if AUTH_TOKEN is None:
         return {"error": "Authentication token is not set"}
 
@@ -382,12 +1858,16 @@ async def get_request(request: Request):
     if auth != ("Bearer " + AUTH_TOKEN):
         return {"error": "Invalid authentication token"}
 
+    if since is not None or limit is not None or format != "json":
+        return export_response("requests", REQUEST_EXPORT_COLUMNS, since, limit, format, include_skills)
+
     return get_requests()
 
 
 @app.get("/cache/all")
 @limiter.limit("5/second")
-async def get_cache(request: Request):
+async def get_cache(request: Request, stats: bool = False, since: Optional[int] = None,
+                    limit: Optional[int] = None, format: str = "json", include_skills: bool = True):
     if AUTH_TOKEN is None:
         return {"error": "Authentication token is not set"}
 
@@ -395,9 +1875,28 @@ async def get_cache(request: Request):
     if auth != ("Bearer " + AUTH_TOKEN):
         return {"error": "Invalid authentication token"}
 
+    if since is not None or limit is not None or format != "json":
+        return export_response("cached_requests", CACHE_EXPORT_COLUMNS, since, limit, format, include_skills)
+
+    if stats:
+        return {"entries": get_cached_requests(), "stats": get_cache_stats()}
+
     return get_cached_requests()
 
 
+@app.post("/cache/images/gc")
+@limiter.limit("5/second")
+async def collect_images(request: Request):
+    if AUTH_TOKEN is None:
+        return {"error": "Authentication token is not set"}
+
+    auth = request.headers.get("Authorization")
+    if auth != ("Bearer " + AUTH_TOKEN):
+        return {"error": "Invalid authentication token"}
+
+    return collect_unreferenced_images()
+
+
 @app.delete("/cache/all")
 @limiter.limit("5/second")
 async def invalidate_cache(request: Request):
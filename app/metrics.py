@@ -0,0 +1,184 @@
+import bisect
+import contextlib
+import os
+import threading
+import time
+
+# Latency buckets in seconds, from cache lookups (sub-millisecond) up to full SerpAPI fetches
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_lock = threading.Lock()
+_registry = []
+
+# Search workers are forked from the server process. Observations they make are buffered and shipped
+# back with the search result, so everything shows up on the server's /metrics.
+_owner_pid = os.getpid()
+_buffer = []
+
+
+def _reset_lock_after_fork():
+    global _lock
+    _lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_lock_after_fork)
+
+
+def mark_owner():
+    # Called by the process that serves /metrics
+    global _owner_pid
+    _owner_pid = os.getpid()
+    _buffer.clear()
+
+
+def drain():
+    observations = list(_buffer)
+    _buffer.clear()
+    return observations
+
+
+def replay(observations):
+    metrics = {metric.name: metric for metric in _registry}
+    for name, method, value, labels in observations:
+        getattr(metrics[name], method)(value, **labels)
+
+
+def _label_key(metric, labels):
+    return tuple(str(labels.get(name, '')) for name in metric.label_names)
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values = {}
+        with _lock:
+            _registry.append(self)
+
+    def _forwarded(self, method, value, labels):
+        if os.getpid() != _owner_pid:
+            _buffer.append((self.name, method, value, labels))
+            return True
+        return False
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        with _lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, key)} {value}")
+        return lines
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if self._forwarded('inc', amount, labels):
+            return
+        key = _label_key(self, labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def __init__(self, name, documentation, label_names=(), function=None):
+        super().__init__(name, documentation, label_names)
+        self.function = function
+
+    def set(self, value, **labels):
+        key = _label_key(self, labels)
+        with _lock:
+            self._values[key] = value
+
+    def render(self):
+        if self.function is not None:
+            self.set(self.function())
+        return super().render()
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        if self._forwarded('observe', value, labels):
+            return
+        key = _label_key(self, labels)
+        position = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[position] += 1
+            self._values[key] = (counts, total + value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        with _lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        for key, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+def render_metrics():
+    # Prometheus text exposition format 0.0.4
+    with _lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+STAGE_SECONDS = Histogram('jk_stage_seconds', 'Duration of a search pipeline stage', ['stage'])
+CACHE_LOOKUPS = Counter('jk_cache_lookups_total', 'Result cache lookups by outcome', ['result'])
+SERPAPI_CALLS = Counter('jk_serpapi_calls_total', 'Result pages requested from SerpAPI')
+SERPAPI_ERRORS = Counter('jk_serpapi_errors_total', 'SerpAPI pages that failed or returned an error')
+SERPAPI_THROTTLED = Counter('jk_serpapi_throttled_total', 'SerpAPI calls skipped by the outbound scheduler',
+                            ['priority'])
+SERPAPI_DEGRADED = Counter('jk_serpapi_degraded_searches_total', 'Searches that fetched fewer pages to save budget',
+                           ['priority'])
+COALESCED_SEARCHES = Counter('jk_coalesced_searches_total', 'Searches answered by another in-flight computation',
+                             ['scope'])
+LEMMA_CACHE_LOOKUPS = Counter('jk_lemma_cache_lookups_total', 'Lemmatized description lookups by outcome',
+                              ['result'])
+NEAR_DUPLICATES = Counter('jk_near_duplicate_postings_total',
+                          'New postings collapsed into a near-duplicate before extraction')
+
+
+@contextlib.contextmanager
+def time_stage(stage, timings=None):
+    # Observes the stage duration and, when given a dict, adds it to a per-request breakdown
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        STAGE_SECONDS.observe(seconds, stage=stage)
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + seconds
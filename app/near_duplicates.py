@@ -0,0 +1,89 @@
+import re
+import zlib
+
+import numpy as np
+
+# MinHash signatures over word shingles of the cleaned descriptions, and LSH buckets to find the postings
+# that share most of their shingles: the same posting syndicated on several job boards, with the board's
+# boilerplate around it. Signatures only depend on the text, they are the same in every process.
+NUM_PERMUTATIONS = 128
+BANDS = 32  # 4 rows per band: pairs above ~0.5 Jaccard similarity share at least one bucket almost surely
+SHINGLE_SIZE = 5
+DEFAULT_THRESHOLD = 0.7
+WORD_PATTERN = re.compile(r'\w+')
+WORD_HASHES_MAX_ENTRIES = 200000
+
+_random = np.random.default_rng(1093)
+# multiply-add-shift hashing of the 32-bit shingle hashes, one (odd multiplier, increment) per permutation
+_MULTIPLIERS = _random.integers(1, 2 ** 64, NUM_PERMUTATIONS, dtype=np.uint64, endpoint=False) | np.uint64(1)
+_INCREMENTS = _random.integers(0, 2 ** 64, NUM_PERMUTATIONS, dtype=np.uint64, endpoint=False)
+# a shingle hashes to the polynomial of its word hashes, a band to a random linear combination of its rows
+_SHINGLE_POWERS = _random.integers(1, 2 ** 64, SHINGLE_SIZE, dtype=np.uint64, endpoint=False) | np.uint64(1)
+_BAND_MULTIPLIERS = _random.integers(1, 2 ** 64, (BANDS, NUM_PERMUTATIONS // BANDS), dtype=np.uint64,
+                                     endpoint=False) | np.uint64(1)
+_BAND_INCREMENTS = _random.integers(0, 2 ** 64, BANDS, dtype=np.uint64, endpoint=False)
+_word_hashes = {}  # postings share most of their words, each is hashed once per process
+
+
+def shingle_hashes(text):
+    # 32-bit hashes of the word SHINGLE_SIZE-grams, every word is hashed once
+    words = WORD_PATTERN.findall(text.lower())
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+    if len(_word_hashes) > WORD_HASHES_MAX_ENTRIES:
+        _word_hashes.clear()
+    for word in set(words).difference(_word_hashes):
+        _word_hashes[word] = zlib.crc32(word.encode('utf-8'))
+    word_hashes = np.fromiter(map(_word_hashes.__getitem__, words), dtype=np.uint64, count=len(words))
+    size = min(SHINGLE_SIZE, len(words))
+    count = len(words) - size + 1
+    hashes = np.zeros(count, dtype=np.uint64)
+    for offset in range(size):
+        hashes += word_hashes[offset:offset + count] * _SHINGLE_POWERS[offset]
+    return hashes >> np.uint64(32)
+
+
+def signature(text):
+    # Smallest hash of the shingles under each permutation, None for descriptions without words
+    hashes = shingle_hashes(text)
+    if not hashes.size:
+        return None
+    return ((np.outer(hashes, _MULTIPLIERS) + _INCREMENTS) >> np.uint64(32)).min(axis=0).astype(np.uint32)
+
+
+def buckets(signature):
+    # One LSH bucket per band, as signed 64-bit integers for SQLite. Every band hashes with its own
+    # multipliers, so equal rows of different bands do not collide.
+    rows = signature.reshape(BANDS, -1).astype(np.uint64)
+    return ((rows * _BAND_MULTIPLIERS).sum(axis=1) + _BAND_INCREMENTS).view(np.int64).tolist()
+
+
+def similarity(signatures, other):
+    # Estimated Jaccard similarity of the shingle sets, of one signature or of each row of a stack of them
+    return np.count_nonzero(signatures == other, axis=-1) / NUM_PERMUTATIONS
+
+
+def find_near_duplicates(signatures, threshold, stored=None):
+    # signatures: {job_id: signature or None} of new postings, in order. stored: {bucket: [(job_id, signature)]}
+    # of postings seen before that share a bucket with them. Returns {job_id: job_id of the posting it
+    # duplicates} for the new postings at least `threshold` similar to a stored or an earlier new posting.
+    stored = stored or {}
+    seen = {}
+    duplicates = {}
+    for job_id, job_signature in signatures.items():
+        if job_signature is None:
+            continue
+        job_buckets = buckets(job_signature)
+        candidates = {}
+        for bucket in job_buckets:
+            candidates.update(stored.get(bucket, ()))
+            candidates.update(seen.get(bucket, ()))
+        if candidates:
+            similarities = similarity(np.stack(list(candidates.values())), job_signature)
+            best = int(similarities.argmax())
+            if similarities[best] >= threshold:
+                duplicates[job_id] = list(candidates)[best]
+                continue
+        for bucket in job_buckets:
+            seen.setdefault(bucket, []).append((job_id, job_signature))
+    return duplicates
@@ -0,0 +1,119 @@
+"""Serve the API from several worker processes that share one loaded copy of the model.
+
+    python -m app.prefork --workers 4 --port 8000
+
+The master imports the app, loads the spaCy model (or the skills dictionary), pandas,
+matplotlib and seaborn, draws one chart, then freezes the garbage collector and forks the
+workers. They inherit all of it copy-on-write, so only the pages a worker writes to become
+its own. Each worker runs uvicorn on the listening socket of the master, and the master
+restarts workers that die and stops them all on SIGTERM or SIGINT.
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import time
+
+import uvicorn
+
+PREFORK_WORKERS = int(os.getenv('JK_WORKERS', '2'))
+RESTART_DELAY_SECONDS = 1.0
+
+
+def load_application():
+    # Collection is off while the app loads and frozen before the fork: a collection in a worker
+    # would otherwise write to the header of every inherited object and unshare its page
+    gc.disable()
+    started = time.perf_counter()
+    from app import db
+    from app.app import warm_up
+    from app.main import app
+
+    warm_up()
+    db.close_connection()  # opened while creating the tables, the workers open their own
+    gc.collect()
+    gc.freeze()
+    print(f"Prefork master {os.getpid()} loaded the app in {time.perf_counter() - started:.2f}s, "
+          f"{gc.get_freeze_count()} objects frozen")
+    return app
+
+
+def bind_socket(host, port):
+    sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock, log_level):
+    from app.main import reset_after_fork
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    gc.enable()
+    reset_after_fork()
+    server = uvicorn.Server(uvicorn.Config(app, log_level=log_level, proxy_headers=True))
+    server.run(sockets=[sock])
+
+
+def spawn_worker(app, sock, log_level):
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            run_worker(app, sock, log_level)
+            status = 0
+        finally:
+            os._exit(status)
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default=os.getenv('JK_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('JK_PORT', '8000')))
+    parser.add_argument('--workers', type=int, default=PREFORK_WORKERS)
+    parser.add_argument('--log-level', default='info')
+    args = parser.parse_args()
+
+    app = load_application()
+    sock = bind_socket(args.host, args.port)
+    workers = {spawn_worker(app, sock, args.log_level) for _ in range(args.workers)}
+    print(f"Prefork master {os.getpid()} serving on {args.host}:{args.port} with workers {sorted(workers)}")
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        if pid not in workers:
+            continue
+        workers.discard(pid)
+        if not stopping:
+            print(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}, starting a new one")
+            time.sleep(RESTART_DELAY_SECONDS)
+            workers.add(spawn_worker(app, sock, args.log_level))
+
+    sock.close()
+    print("Prefork master stopped")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+import os
+import sqlite3
+import time
+from datetime import datetime, timezone
+
+from app.db import get_connection
+from app.metrics import SERPAPI_DEGRADED, SERPAPI_THROTTLED
+
+# Outbound SerpAPI calls of every server and search worker process share one token bucket and one
+# monthly budget ledger, both kept in SQLite
+ENABLED = os.getenv('JK_SERPAPI_SCHEDULER', '1') != '0'
+MONTHLY_QUOTA = int(os.getenv('JK_SERPAPI_MONTHLY_QUOTA', '5000'))
+RATE_PER_SECOND = float(os.getenv('JK_SERPAPI_RATE', '1.0'))
+BURST = float(os.getenv('JK_SERPAPI_BURST', '8'))
+DEGRADED_PAGES = int(os.getenv('JK_SERPAPI_DEGRADED_PAGES', '2'))
+LOW_BUDGET_SHARE = float(os.getenv('JK_SERPAPI_LOW_BUDGET_SHARE', '0.1'))  # degrade below this share of the quota
+
+# priority: (share of the monthly quota left to higher priorities, tokens left in the bucket for them,
+#            seconds a call may wait for a token)
+PRIORITIES = {
+    'interactive': (0.0, 0, 10),
+    'batch': (0.1, 1, 300),
+    'refresh': (0.25, 2, 60),
+}
+
+_tables_pid = None
+
+
+def current_period():
+    return datetime.now(timezone.utc).strftime('%Y-%m')
+
+
+def _connection():
+    global _tables_pid
+    connection = get_connection()
+    if _tables_pid != os.getpid():
+        connection.execute(
+            """
+                create table if not exists serpapi_bucket (
+                    name TEXT not null primary key,
+                    tokens REAL not null,
+                    updated_at REAL not null
+                )
+            """
+        )
+        connection.execute(
+            """
+                create table if not exists serpapi_ledger (
+                    period TEXT not null,
+                    priority TEXT not null,
+                    calls INTEGER not null,
+                    primary key (period, priority)
+                )
+            """
+        )
+        connection.commit()
+        _tables_pid = os.getpid()
+    return connection
+
+
+def _used_calls(connection, period):
+    (used,) = connection.execute("select coalesce(sum(calls), 0) from serpapi_ledger where period = ?",
+                                 (period,)).fetchone()
+    return used
+
+
+def available_calls(priority='interactive'):
+    # Calls this priority may still make this month
+    budget_reserve = PRIORITIES[priority][0]
+    return int(MONTHLY_QUOTA * (1 - budget_reserve)) - _used_calls(_connection(), current_period())
+
+
+def plan_pages(pages, priority='interactive', searches=1):
+    # Result pages each of `searches` searches may fetch. When the budget runs short they get
+    # DEGRADED_PAGES pages, and none once it is used up: the search is then answered from the
+    # postings stored for the query instead of failing.
+    if not ENABLED:
+        return pages
+    available = available_calls(priority)
+    if available >= MONTHLY_QUOTA * LOW_BUDGET_SHARE and available >= len(pages) * searches:
+        return pages
+
+    SERPAPI_DEGRADED.inc(priority=priority)
+    return pages[:max(0, min(len(pages), DEGRADED_PAGES, available // searches))]
+
+
+def _try_acquire(priority):
+    # 0 when a token was taken, otherwise the seconds until one is available, or None when the
+    # priority's share of the monthly budget is used up
+    budget_reserve, bucket_reserve, _ = PRIORITIES[priority]
+    connection = _connection()
+    now = time.time()
+    period = current_period()
+    connection.execute("begin immediate")
+    try:
+        if _used_calls(connection, period) >= MONTHLY_QUOTA * (1 - budget_reserve):
+            return None
+
+        row = connection.execute("select tokens, updated_at from serpapi_bucket where name = 'serpapi'").fetchone()
+        tokens = BURST if row is None else min(BURST, row[0] + (now - row[1]) * RATE_PER_SECOND)
+        needed = 1 + bucket_reserve
+        if tokens < needed:
+            return (needed - tokens) / RATE_PER_SECOND
+
+        connection.execute("insert or replace into serpapi_bucket (name, tokens, updated_at) values ('serpapi', ?, ?)",
+                           (tokens - 1, now))
+        connection.execute(
+            """
+                insert into serpapi_ledger (period, priority, calls) values (?, ?, 1)
+                on conflict (period, priority) do update set calls = calls + 1
+            """,
+            (period, priority)
+        )
+        connection.commit()
+        return 0
+    finally:
+        if connection.in_transaction:
+            connection.rollback()
+
+
+def acquire(priority='interactive'):
+    # Blocks until the call may go out. Returns False when the budget is used up or no token
+    # frees up within the priority's wait limit, the caller then skips the page.
+    if not ENABLED:
+        return True
+    deadline = time.monotonic() + PRIORITIES[priority][2]
+    while True:
+        try:
+            wait = _try_acquire(priority)
+        except sqlite3.OperationalError as e:
+            # the ledger must not take searches down with it
+            print(f"SerpAPI scheduler unavailable, letting the call through: {e!r}")
+            return True
+        if wait == 0:
+            return True
+        if wait is None or time.monotonic() + wait > deadline:
+            SERPAPI_THROTTLED.inc(priority=priority)
+            return False
+        time.sleep(wait)
+
+
+def get_budget_status():
+    connection = _connection()
+    period = current_period()
+    calls = dict(connection.execute("select priority, calls from serpapi_ledger where period = ?",
+                                    (period,)).fetchall())
+    row = connection.execute("select tokens, updated_at from serpapi_bucket where name = 'serpapi'").fetchone()
+    tokens = BURST if row is None else min(BURST, row[0] + (time.time() - row[1]) * RATE_PER_SECOND)
+    used = sum(calls.values())
+    return {
+        "enabled": ENABLED,
+        "period": period,
+        "monthlyQuota": MONTHLY_QUOTA,
+        "used": used,
+        "remaining": max(0, MONTHLY_QUOTA - used),
+        "callsByPriority": {priority: calls.get(priority, 0) for priority in PRIORITIES},
+        "bucketTokens": round(tokens, 2),
+        "ratePerSecond": RATE_PER_SECOND,
+        "burst": BURST
+    }
@@ -0,0 +1,91 @@
+"""Load test of cache hits on POST /search/tasks, in process through the ASGI app.
+
+    python -m benchmarks.bench_cache_hits --skills 2000 --requests 5000 --concurrency 8 --output hits.json
+
+A ranking of --skills synthetic skills (a full ranking of a few hundred postings has a couple of
+thousand words) is cached under --titles search texts, then the endpoint is hit with --concurrency
+clients until --requests responses came back. Reports the latency percentiles and the throughput.
+The rate limiter is turned off and the per-search log lines are discarded. The database is a
+temporary one unless JK_BASE_DIR is set.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+
+async def run_clients(app, titles, requests, concurrency):
+    import httpx
+
+    latencies = []
+    remaining = iter(range(requests))
+
+    async def client(http):
+        for number in remaining:
+            started = time.perf_counter()
+            response = await http.post('/search/tasks', json={'searchToken': titles[number % len(titles)]})
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise RuntimeError(f"Expected a cache hit, got {response.status_code}: {response.text[:200]}")
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://bench') as http:
+        started = time.perf_counter()
+        await asyncio.gather(*(client(http) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return latencies, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--skills', type=int, default=2000)
+    parser.add_argument('--titles', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--warm-up', type=int, default=200)
+    parser.add_argument('--output', default=None, help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    os.environ.setdefault('JK_BASE_DIR', tempfile.mkdtemp(prefix='jk-bench-'))
+    from app.app import rank_skills
+    from app.main import app, cache_request, limiter
+
+    limiter.enabled = False
+    random.seed(7)
+    titles = [f"benchmark title {number}" for number in range(args.titles)]
+    for title in titles:
+        counts = {f"skill{number}": random.randint(1, 400) for number in range(args.skills)}
+        cache_request(title, rank_skills(counts).to_json(), 'benchmark.png')
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        asyncio.run(run_clients(app, titles, args.warm_up, args.concurrency))
+        latencies, elapsed = asyncio.run(run_clients(app, titles, args.requests, args.concurrency))
+
+    results = {
+        "skills": args.skills,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "p50Ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p90Ms": round(percentile(latencies, 0.90) * 1000, 3),
+        "p99Ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "maxMs": round(max(latencies) * 1000, 3),
+        "meanMs": round(statistics.mean(latencies) * 1000, 3),
+        "requestsPerSecond": round(args.requests / elapsed, 1)
+    }
+    print(" ".join(f"{name} {value}" for name, value in results.items()))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
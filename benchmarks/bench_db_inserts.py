@@ -0,0 +1,102 @@
+"""Insert throughput of the requests table, before and after the WAL / write-behind DB layer.
+
+    python -m benchmarks.bench_db_inserts --rows 5000
+
+"before" commits every row on a default (rollback journal) connection like save_request used to,
+"after" queues the rows on the WriteBehindWriter of a WAL connection and waits for the flush.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+
+from app.db import WriteBehindWriter, open_connection
+
+INSERT_REQUEST = """
+    insert into requests (requestId, search_text, skills, created_at, ip_address) 
+    values (?, ?, ?, ?, ?)
+"""
+
+SKILLS = json.dumps({"word": {str(i): f"skill{i}" for i in range(200)},
+                     "occurrences": {str(i): 200 - i for i in range(200)}})
+
+
+def create_table(connection):
+    connection.execute(
+        """
+            create table requests (
+                requestId TEXT not null primary key, 
+                search_text TEXT not null, 
+                skills TEXT not null,
+                created_at TEXT not null,
+                ip_address TEXT
+            )
+        """
+    )
+    connection.execute("create index requests_created_at on requests (created_at)")
+    connection.execute("create index requests_search_text on requests (search_text)")
+    connection.commit()
+
+
+def make_row(i):
+    return str(uuid.uuid4()), f"job title {i % 50}", SKILLS, datetime.now(timezone.utc), "127.0.0.1"
+
+
+def bench_before(path, rows):
+    connection = sqlite3.connect(path)
+    create_table(connection)
+    latencies = []
+    started = time.perf_counter()
+    for i in range(rows):
+        call_started = time.perf_counter()
+        connection.execute(INSERT_REQUEST, make_row(i))
+        connection.commit()
+        latencies.append(time.perf_counter() - call_started)
+    elapsed = time.perf_counter() - started
+    connection.close()
+    return elapsed, latencies
+
+
+def bench_after(path, rows):
+    connection = open_connection(path)
+    create_table(connection)
+    connection.close()
+
+    writer = WriteBehindWriter(INSERT_REQUEST, path=path)
+    latencies = []
+    started = time.perf_counter()
+    for i in range(rows):
+        call_started = time.perf_counter()
+        writer.add(make_row(i))
+        latencies.append(time.perf_counter() - call_started)
+    writer.close()
+    elapsed = time.perf_counter() - started
+    assert writer.written == rows
+    return elapsed, latencies
+
+
+def report(name, rows, elapsed, latencies):
+    latencies = sorted(latencies)
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{name:<8} {rows / elapsed:10.0f} rows/s   per-call p99 {p99 * 1e6:9.1f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--dir', default=None, help='directory for the scratch databases (defaults to a temp dir)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        for name, bench in (('before', bench_before), ('after', bench_after)):
+            path = os.path.join(directory, f"{name}.db")
+            elapsed, latencies = bench(path, args.rows)
+            report(name, args.rows, elapsed, latencies)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Compare the two extraction modes on the recorded google_jobs descriptions.
+
+    python -m benchmarks.bench_extraction --docs 2000 --repeat 3 --min-speedup 10
+
+'nlp' is text_process without the lemma cache (spaCy tagger, attribute ruler and lemmatizer),
+'fast' is match_skills against the skills dictionary. Exits non-zero when the fast mode is
+not at least --min-speedup times faster per description.
+"""
+import argparse
+import sys
+import time
+from collections import Counter
+
+from app.app import clean_jobs, get_gazetteer, match_skills, text_process, warm_up
+from benchmarks.pipeline import load_fixture_pages, replay_pages
+
+
+def load_descriptions(docs):
+    import pandas as pd
+
+    pages = replay_pages(load_fixture_pages(), docs)
+    jobs = [job for start in sorted(pages) for job in pages[start]['jobs_results']]
+    return list(clean_jobs(pd.DataFrame.from_records(jobs)))
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--docs', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--min-speedup', type=float, default=10.0)
+    args = parser.parse_args()
+
+    warm_up()
+    get_gazetteer()
+    descriptions = load_descriptions(args.docs)
+    print(f"{len(descriptions)} descriptions, {get_gazetteer().size} dictionary phrases")
+
+    nlp = best_of(lambda: text_process(descriptions), args.repeat)
+    fast = best_of(lambda: match_skills(descriptions), args.repeat)
+    for name, seconds in (('nlp', nlp), ('fast', fast)):
+        print(f"{name:<6} {seconds * 1000:9.1f} ms {len(descriptions) / seconds:12.1f} docs/s")
+    speedup = nlp / fast
+    print(f"fast mode is {speedup:.1f}x faster")
+
+    top = Counter(skill for doc in match_skills(descriptions) for skill in doc).most_common(10)
+    print("top fast-mode skills: " + ", ".join(f"{skill} ({count})" for skill, count in top))
+
+    if speedup < args.min_speedup:
+        print(f"expected at least {args.min_speedup:.0f}x")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Compare the counting engine in find_skills with the previous gensim BoW implementation.
+
+    python -m benchmarks.bench_find_skills --docs 10000 --repeat 5
+
+The legacy implementation needs gensim, which is no longer a runtime dependency
+(pip install gensim to include it in the comparison).
+"""
+import argparse
+import random
+import time
+from collections import Counter
+
+import pandas as pd
+
+from app.app import find_skills
+
+
+def legacy_find_skills(lemmatize_docs):
+    import gensim
+
+    dictionary = gensim.corpora.Dictionary(lemmatize_docs)
+    bow_corpus = [dictionary.doc2bow(doc, allow_update=True) for doc in lemmatize_docs]
+    id_words = [[(dictionary[id_word], count) for id_word, count in line] for line in bow_corpus]
+    flat_list = [item for sublist in id_words for item in sublist]
+    combined_list = list(Counter(key for key, num in flat_list for idx in range(num)).items())
+    return pd.DataFrame(combined_list, columns=['word', 'occurrences']).sort_values(by=['occurrences'],
+                                                                                    ascending=False,
+                                                                                    ignore_index=True)
+
+
+def make_corpus(docs, vocabulary=5000, tokens_per_doc=120, seed=7):
+    # Zipf-like token distribution, close to what the lemmatizer emits for real postings
+    rng = random.Random(seed)
+    words = [f"skill{i}" for i in range(vocabulary)]
+    weights = [1 / (rank + 1) for rank in range(vocabulary)]
+    return [rng.choices(words, weights, k=tokens_per_doc) for _ in range(docs)]
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--docs', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top-k', type=int, default=15)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.docs)
+    print(f"{args.docs} descriptions, {sum(len(doc) for doc in corpus)} tokens")
+
+    cases = [
+        ('find_skills tf', lambda: find_skills(corpus, mode='tf')),
+        ('find_skills df', lambda: find_skills(corpus, mode='df')),
+        (f'find_skills tf top_k={args.top_k}', lambda: find_skills(corpus, top_k=args.top_k, mode='tf')),
+    ]
+    try:
+        import gensim  # noqa: F401
+        cases.insert(0, ('legacy gensim', lambda: legacy_find_skills(corpus)))
+    except ImportError:
+        print("gensim is not installed, skipping the legacy implementation")
+
+    for name, func in cases:
+        print(f"{name:<28} {best_of(func, args.repeat) * 1000:9.1f} ms")
+
+    if cases[0][0] == 'legacy gensim':
+        legacy = legacy_find_skills(corpus)
+        current = find_skills(corpus, mode='tf')
+        assert dict(zip(legacy.word, legacy.occurrences)) == dict(zip(current.word, current.occurrences))
+        print("tf counts match the legacy implementation")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+"""Offline benchmark of every search pipeline stage against recorded google_jobs pages.
+
+    python -m benchmarks.pipeline --sizes 40 1000 10000 --output bench.json
+    python -m benchmarks.pipeline --sizes 40 1000 --baseline bench.json --threshold 0.2
+
+get_jobs runs against the local SerpAPI stub serving the fixture pages, larger corpora are
+built by replaying the fixtures with shuffled bullet order and fresh job ids. Each stage is
+timed on its own, then run again under tracemalloc for its peak Python memory. With
+--baseline the run is compared stage by stage and exits non-zero when any stage got slower
+than the baseline by more than the threshold.
+"""
+import argparse
+import copy
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+import tracemalloc
+
+import app.app as pipeline
+from app import scheduler
+from app.near_duplicates import DEFAULT_THRESHOLD, find_near_duplicates, signature
+
+FIXTURES_DIRECTORY = os.path.join(os.path.dirname(__file__), 'fixtures')
+PAGE_SIZE = 10
+
+
+def load_fixture_pages():
+    pages = []
+    for name in sorted(os.listdir(FIXTURES_DIRECTORY), key=lambda n: int(n.rsplit('_', 1)[1].split('.')[0])):
+        if name.startswith('google_jobs_start_') and name.endswith('.json'):
+            with open(os.path.join(FIXTURES_DIRECTORY, name)) as f:
+                pages.append(json.load(f))
+    return pages
+
+
+def replay_pages(fixture_pages, size, seed=11):
+    # {start: payload} covering `size` postings, recorded pages first and varied copies after them
+    rng = random.Random(seed)
+    pages = {}
+    for page_number in range((size + PAGE_SIZE - 1) // PAGE_SIZE):
+        page = copy.deepcopy(fixture_pages[page_number % len(fixture_pages)])
+        if page_number >= len(fixture_pages):
+            for job in page['jobs_results']:
+                job['job_id'] = f"{job['job_id']}-{page_number}"
+                lines = job['description'].split('\n')
+                bullets = [line for line in lines if line.startswith('•')]
+                rng.shuffle(bullets)
+                shuffled = iter(bullets)
+                job['description'] = '\n'.join(next(shuffled) if line.startswith('•') else line for line in lines)
+        remaining = size - page_number * PAGE_SIZE
+        page['jobs_results'] = page['jobs_results'][:remaining]
+        pages[page_number * PAGE_SIZE] = page
+    return pages
+
+
+def measure(func, with_memory):
+    started = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - started
+
+    peak_mb = None
+    if with_memory:
+        tracemalloc.start()
+        func()
+        peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+    return result, seconds, peak_mb
+
+
+def stage_result(seconds, peak_mb, items):
+    return {
+        "seconds": round(seconds, 4),
+        "peakMemoryMb": None if peak_mb is None else round(peak_mb, 2),
+        "items": items,
+        "itemsPerSecond": round(items / seconds, 1) if seconds else None
+    }
+
+
+def bench_size(size, fixture_pages, with_memory):
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+    from serpapi_stub import make_server
+
+    server = make_server(0, pages=replay_pages(fixture_pages, size))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    pipeline.SERPAPI_URL = f"http://127.0.0.1:{server.server_port}/search.json"
+    starts = list(range(0, size, PAGE_SIZE))
+
+    try:
+        results = {}
+        job_data, seconds, peak = measure(lambda: pipeline.get_jobs(starts, 'data analyst'), with_memory)
+        results['get_jobs'] = stage_result(seconds, peak, len(job_data))
+
+        descriptions, seconds, peak = measure(lambda: pipeline.clean_jobs(job_data.copy()), with_memory)
+        results['clean_jobs'] = stage_result(seconds, peak, len(descriptions))
+
+        def dedupe():
+            signatures = {position: signature(description) for position, description in enumerate(descriptions)}
+            return find_near_duplicates(signatures, DEFAULT_THRESHOLD)
+
+        duplicates, seconds, peak = measure(dedupe, with_memory)
+        results['near_duplicates'] = stage_result(seconds, peak, len(descriptions))
+        print(f"{size:>6} near-duplicates: {len(duplicates)} of {len(descriptions)} descriptions")
+
+        docs, seconds, peak = measure(lambda: pipeline.text_process(descriptions), with_memory)
+        results['text_process'] = stage_result(seconds, peak, len(docs))
+
+        matched, seconds, peak = measure(lambda: pipeline.match_skills(descriptions), with_memory)
+        results['match_skills'] = stage_result(seconds, peak, len(matched))
+
+        skills, seconds, peak = measure(lambda: pipeline.find_skills(docs), with_memory)
+        results['find_skills'] = stage_result(seconds, peak, len(docs))
+
+        def render():
+            pipeline._chart_cache.clear()
+            return pipeline.render_chart(skills)
+
+        _, seconds, peak = measure(render, with_memory)
+        results['visualize'] = stage_result(seconds, peak, 1)
+        return results
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for size, stages in results.items():
+        for stage, current in stages.items():
+            previous = baseline.get('results', {}).get(size, {}).get(stage)
+            if not previous or not previous['seconds']:
+                continue
+            ratio = current['seconds'] / previous['seconds']
+            marker = ''
+            if ratio > 1 + threshold:
+                regressions.append((size, stage, ratio))
+                marker = '  <-- regression'
+            print(f"{size:>6} {stage:<14} {previous['seconds']:9.3f}s -> {current['seconds']:9.3f}s  x{ratio:5.2f}{marker}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[40, 1000, 10000])
+    parser.add_argument('--output', default=None, help='write the results to this JSON file')
+    parser.add_argument('--baseline', default=None, help='compare against a previous results file')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown, 0.2 = 20%%')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    args = parser.parse_args()
+
+    # The stub is not metered, and the page fan-out is part of what is measured
+    scheduler.ENABLED = False
+    # Load the model and plotting libraries up front so the first stage timings are not cold starts
+    pipeline.warm_up()
+
+    fixture_pages = load_fixture_pages()
+    results = {}
+    for size in args.sizes:
+        results[str(size)] = bench_size(size, fixture_pages, not args.no_memory)
+        for stage, result in results[str(size)].items():
+            memory = '' if result['peakMemoryMb'] is None else f"{result['peakMemoryMb']:9.1f} MB"
+            print(f"{size:>6} {stage:<14} {result['seconds']:9.3f}s {result['itemsPerSecond'] or 0:12.1f}/s {memory}")
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "nlpVersion": pipeline.NLP_VERSION,
+            "createdAt": time.strftime('%Y-%m-%dT%H:%M:%S%z')
+        },
+        "results": results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} stage(s) slower than the baseline by more than {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
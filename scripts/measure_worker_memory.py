@@ -0,0 +1,106 @@
+"""Memory of a running app.prefork master and its workers, read from /proc (Linux only).
+
+    python scripts/measure_worker_memory.py               # finds the `python -m app.prefork` master
+    python scripts/measure_worker_memory.py --pid 1234 --descendants --json
+
+RSS counts every page a process maps, shared or not, so summing it over the workers counts the
+model once per worker. PSS divides each shared page between the processes mapping it: the PSS
+total is what the whole server really takes, and Private is what each additional worker adds.
+"""
+import argparse
+import json
+import os
+import sys
+
+FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+
+def read_cmdline(pid):
+    try:
+        with open(f'/proc/{pid}/cmdline', 'rb') as f:
+            return f.read().replace(b'\0', b' ').decode(errors='replace').strip()
+    except OSError:
+        return ''
+
+
+def find_master():
+    for entry in os.listdir('/proc'):
+        if entry.isdigit() and int(entry) != os.getpid() and 'app.prefork' in read_cmdline(entry):
+            # the master is the one whose parent is not itself a prefork process
+            with open(f'/proc/{entry}/stat') as f:
+                ppid = f.read().rsplit(')', 1)[1].split()[1]
+            if 'app.prefork' not in read_cmdline(ppid):
+                return int(entry)
+    return None
+
+
+def children(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        # kernels without CONFIG_PROC_CHILDREN: scan the parent pid of every process
+        found = []
+        for entry in os.listdir('/proc'):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+            except OSError:
+                continue
+            if ppid == pid:
+                found.append(int(entry))
+        return sorted(found)
+
+
+def read_memory(pid):
+    # kB per field, smaps_rollup sums the per-mapping figures of /proc/<pid>/smaps
+    memory = dict.fromkeys(FIELDS, 0)
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            name, _, value = line.partition(':')
+            if name in memory:
+                memory[name] = int(value.split()[0])
+    return memory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pid', type=int, help="pid of the master, found from its command line by default")
+    parser.add_argument('--descendants', action='store_true',
+                        help="also count the children of the workers (search process pools)")
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    master = args.pid or find_master()
+    if master is None:
+        sys.exit("No app.prefork master found, pass --pid")
+
+    processes = [('master', master)]
+    pending = [(pid, 'worker') for pid in children(master)]
+    while pending:
+        pid, role = pending.pop(0)
+        processes.append((role, pid))
+        if args.descendants:
+            pending.extend((child, f'{role} child') for child in children(pid))
+
+    rows = []
+    for role, pid in processes:
+        try:
+            rows.append({"role": role, "pid": pid, **read_memory(pid)})
+        except OSError as e:
+            print(f"Skipping {pid}: {e}", file=sys.stderr)
+    totals = {field: sum(row[field] for row in rows) for field in FIELDS}
+
+    if args.json:
+        print(json.dumps({"processes": rows, "totalKb": totals}, indent=2))
+        return
+
+    print(f"{'role':<14} {'pid':>8} " + " ".join(f"{field + ' MB':>16}" for field in FIELDS))
+    for row in rows + [{"role": "total", "pid": "", **totals}]:
+        print(f"{row['role']:<14} {row['pid']:>8} " + " ".join(f"{row[field] / 1024:16.1f}" for field in FIELDS))
+
+
+if __name__ == '__main__':
+    main()
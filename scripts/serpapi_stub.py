@@ -0,0 +1,112 @@
+"""Local stand-in for the SerpAPI `google_jobs` engine.
+
+Point the backend at it with JK_SERPAPI_URL=http://127.0.0.1:8765/search.json
+
+    python scripts/serpapi_stub.py --port 8765 --delay 0.2 --fail-rate 0.1
+
+Pages are served from `<fixtures>/google_jobs_start_<start>.json` when such a file exists,
+otherwise a deterministic page of synthetic postings is generated for the query.
+In-process users (the benchmarks) can hand make_server a {start: payload} mapping instead.
+"""
+import argparse
+import json
+import os
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+PAGE_SIZE = 10
+
+BULLETS = [
+    "Build and maintain dashboards in Tableau and Looker",
+    "Write complex SQL queries against the data warehouse",
+    "Develop ETL pipelines in Python and Airflow",
+    "Partner with stakeholders to define metrics and reporting",
+    "Communicate findings to leadership and product teams",
+    "Design experiments and analyze A/B test results",
+    "Model data in dbt and Snowflake",
+    "Manage project timelines and deliverables",
+    "Experience with machine learning and statistics",
+    "Present insights using Excel and PowerPoint",
+]
+
+
+def synthetic_page(query, start):
+    rng = random.Random(f"{query}:{start}")
+    jobs = []
+    for i in range(PAGE_SIZE):
+        bullets = rng.sample(BULLETS, 5)
+        jobs.append({
+            "title": f"{query.title()} {start + i}",
+            "company_name": f"Company {rng.randint(1, 500)}",
+            "location": "New York, NY",
+            "via": "via LinkedIn",
+            "description": "About the role\n" + "\n".join(f"• {bullet}" for bullet in bullets),
+            "job_id": f"stub-{query.replace(' ', '-')}-{start + i}",
+        })
+    return {"search_metadata": {"status": "Success"}, "jobs_results": jobs}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    pages = None
+    fixtures_dir = None
+    delay = 0.0
+    fail_rate = 0.0
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        if self.delay:
+            time.sleep(self.delay)
+
+        if params.get('engine') != 'google_jobs':
+            return self.send_json(400, {"error": "Unsupported engine"})
+        if random.random() < self.fail_rate:
+            return self.send_json(503, {"error": "Injected failure"})
+
+        start = int(params.get('start', '0'))
+        page = self.pages.get(start) if self.pages else None
+        if page is None and self.fixtures_dir:
+            path = os.path.join(self.fixtures_dir, f"google_jobs_start_{start}.json")
+            if os.path.exists(path):
+                with open(path) as f:
+                    page = json.load(f)
+        if page is None:
+            page = synthetic_page(params.get('q', ''), start)
+        self.send_json(200, page)
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(port=0, fixtures_dir=None, delay=0.0, fail_rate=0.0, pages=None):
+    handler = type('ConfiguredStubHandler', (StubHandler,), {
+        'pages': pages,
+        'fixtures_dir': fixtures_dir,
+        'delay': delay,
+        'fail_rate': fail_rate,
+    })
+    return ThreadingHTTPServer(('127.0.0.1', port), handler)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--fixtures', default=None, help='directory with recorded google_jobs pages')
+    parser.add_argument('--delay', type=float, default=0.0, help='seconds to wait before answering')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='share of requests answered with a 503')
+    args = parser.parse_args()
+
+    server = make_server(args.port, args.fixtures, args.delay, args.fail_rate)
+    print(f"SerpAPI stub listening on http://127.0.0.1:{server.server_port}/search.json")
+    server.serve_forever()
@@ -1,4 +1,131 @@
 var API_DOMAIN = "http://127.0.0.1:8000";
+var POLL_INTERVAL_MS = 1000;
+
+function showSearchResults(data) {
+    // show the image from response
+    $("#not-empty-div").show();
+    $("#imageElement").attr("src", data.imageUrl);
+    $("#imageElementLink").attr("href", data.imageUrl);
+
+    $(".question_block").show();
+
+    $("#skill-list").html(""); // clear the list
+    $("#skill-list").append("<tr class='header'><th>Skill</th><td>Occurrences</td></tr>"); // add the table header
+    data.skills.forEach(function (skill, index) { // iterate over the skills
+        if (index > 30) {
+            return; // show only the first 30 skills
+        }
+        $("#skill-list").append("<tr><th>" + skill.name + "</th><td>" + skill.occurrences + "</td></tr>"); // add each skill to the list
+    });
+
+    // show/hide the container with the "no items found" message
+    if (data.skills.length) {
+        $("#empty-div").hide();
+        $("#skill-list").show();
+        $("#skill-list-div").show();
+    } else {
+        $("#empty-div").show();
+        $("#skill-list").hide();
+        $("#skill-list-div").hide();
+    }
+    searchFinished();
+}
+
+function showPartialSkills(data) {
+    // skills merged from the result pages processed so far, the chart comes with the final result
+    $("#skill-list").html("");
+    $("#skill-list").append("<tr class='header'><th>Skill</th><td>Occurrences</td></tr>");
+    data.skills.forEach(function (skill) {
+        $("#skill-list").append("<tr><th>" + skill.name + "</th><td>" + skill.occurrences + "</td></tr>");
+    });
+    if (data.skills.length) {
+        $("#empty-div").hide();
+        $("#skill-list").show();
+        $("#skill-list-div").show();
+    }
+}
+
+function showSearchFailure() {
+    $("#not-empty-div").hide();
+    $("#skill-list").html("");
+    $("#skill-list").hide();
+    $("#skill-list-div").hide();
+    searchFinished();
+}
+
+function searchFinished() {
+    $("#spinner-div").hide(); // hide the spinner
+    $("#feedback-div").show(); // show the feedback form
+}
+
+function pollSearchTask(taskId) {
+    $.ajax({
+        url: API_DOMAIN + "/search/tasks/" + taskId,
+        method: "GET",
+        context: document.body
+    }).done(function (data) {
+        if (data.status === "done") {
+            showSearchResults(data);
+        } else if (data.status === "failed") {
+            showSearchFailure();
+        } else {
+            setTimeout(function () { pollSearchTask(taskId); }, POLL_INTERVAL_MS); // still running
+        }
+    }).fail(function (xhr) {
+        if (xhr.status === 429) { // rate limited, keep waiting
+            setTimeout(function () { pollSearchTask(taskId); }, POLL_INTERVAL_MS);
+        } else {
+            showSearchFailure();
+        }
+    });
+}
+function startSearchTask(searchToken) {
+    $.ajax({
+        url: API_DOMAIN + "/search/tasks",
+        method: "POST",
+        context: document.body,
+        contentType: "application/json",
+        data: JSON.stringify({
+            "searchToken": searchToken
+        })
+    }).done(function (data) { // if request is successful
+        if (data.status === "done") {
+            showSearchResults(data); // cached searches are answered right away
+        } else {
+            pollSearchTask(data.uuid); // otherwise wait for the search task to finish
+        }
+    }).fail(function () { // if request fails
+        showSearchFailure();
+    });
+}
+
+function streamSearch(searchToken) {
+    // partial rankings are shown as each result page is processed
+    var taskId = null;
+    var source = new EventSource(API_DOMAIN + "/search/stream?searchToken=" + encodeURIComponent(searchToken));
+    source.addEventListener("partial", function (event) {
+        var data = JSON.parse(event.data);
+        taskId = data.uuid;
+        showPartialSkills(data);
+    });
+    source.addEventListener("done", function (event) {
+        source.close();
+        showSearchResults(JSON.parse(event.data));
+    });
+    source.addEventListener("failed", function () {
+        source.close();
+        showSearchFailure();
+    });
+    source.onerror = function () {
+        source.close();
+        if (taskId) {
+            pollSearchTask(taskId); // the stream dropped, the search keeps running on the server
+        } else {
+            startSearchTask(searchToken);
+        }
+    };
+}
+
 $(document).ready(function () {
     // make sure the spinner is hidden when the page loads
     $("#spinner-div").hide();
@@ -13,50 +140,12 @@ $(document).ready(function () {
         $("#spinner-div").show();
 
         // make the API call
-        $.ajax({
-            url: API_DOMAIN + "/search/tasks",
-            method: "POST",
-            context: document.body,
-            contentType: "application/json",
-            data: JSON.stringify({
-                "searchToken": $('#name-2').val() // Grab the value from the input field
-            })
-        }).done(function (data) { // if request is successful
-            // show the image from response
-            $("#not-empty-div").show();
-            $("#imageElement").attr("src", data.imageUrl);
-            $("#imageElementLink").attr("href", data.imageUrl);
-
-            $(".question_block").show();
-
-            $("#skill-list").html(""); // clear the list
-            $("#skill-list").append("<tr class='header'><th>Skill</th><td>Occurrences</td></tr>"); // add the table header
-            data.skills.forEach(function (skill, index) { // iterate over the skills
-                if (index > 30) {
-                    return; // show only the first 30 skills
-                }
-                $("#skill-list").append("<tr><th>" + skill.name + "</th><td>" + skill.occurrences + "</td></tr>"); // add each skill to the list
-            });
-
-            // show/hide the container with the "no items found" message
-            if (data.skills.length) {
-                $("#empty-div").hide();
-                $("#skill-list").show();
-                $("#skill-list-div").show();
-            } else {
-                $("#empty-div").show();
-                $("#skill-list").hide();
-                $("#skill-list-div").hide();
-            }
-        }).fail(function (data) { // if request fails
-            $("#not-empty-div").hide();
-            $("#skill-list").html("");
-            $("#skill-list").hide();
-            $("#skill-list-div").hide();
-        }).always(function () { // this function will always be executed
-            $("#spinner-div").hide(); // hide the spinner
-            $("#feedback-div").show(); // show the feedback form
-        });
+        var searchToken = $('#name-2').val(); // Grab the value from the input field
+        if (window.EventSource) {
+            streamSearch(searchToken);
+        } else {
+            startSearchTask(searchToken);
+        }
 
         return false; // prevent the form from submitting
     });